@@ -1,4 +1,5 @@
 from .semver import *
 
-__all__ = ('SemVer', 'SemSel', 'SelParseError')
+__all__ = ('SemVer', 'SemSel', 'SelParseError', 'VersionIndex', 'MappedVersionIndex',
+           'VersionArray', 'SelectorIndex', 'Instrumentation')
 __doc__ = semver.__doc__
@@ -0,0 +1,204 @@
+"""
+Copyright (c) 2013 FichteFoll
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions: The above copyright notice and this
+permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES
+OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+Benchmarks for parsing, comparing, sorting and selector matching.
+
+Usage:
+    python -m _bench [-h] [-n SIZE] [-r ROUNDS] [-b BATCH] [-k PATTERN] [--json FILE]
+
+Every benchmark runs one operation over each item of a synthetic corpus in timed batches, repeated
+for a number of rounds after an untimed warm-up round. Reported are the operations per second over
+all rounds and percentiles of the per-op latency (the time of a batch divided by its size). The
+corpora are generated from a fixed seed so results of different commits can be compared, e.g. by
+writing them with `--json`.
+"""
+
+import json
+import platform
+import re
+import sys
+from random import Random
+from timeit import default_timer
+
+from semver import SemVer, SemSel
+
+
+class Corpus(object):
+    """Deterministic synthetic version strings and selectors.
+    """
+    def __init__(self, size, seed=1337):
+        self.size = size
+        self.rand = Random(seed)
+
+    def num(self, hi=20):
+        return self.rand.randint(0, hi)
+
+    def triple(self):
+        return '%d.%d.%d' % (self.num(5), self.num(), self.num(40))
+
+    def releases(self):
+        return [self.triple() for _ in range(self.size)]
+
+    def prereleases(self):
+        # Long dotted, nightly-like pre-releases
+        tags = ('alpha', 'beta', 'rc', 'nightly', 'dev')
+        return ['%s-%s.%d.%d' % (self.triple(), self.rand.choice(tags),
+                                 self.rand.randint(20130101, 20131231), self.num(9999))
+                for _ in range(self.size)]
+
+    def builds(self):
+        return ['%s%s+b.%d.%s' % (self.triple(), self.rand.choice(('', '-rc.1', '-beta')),
+                                  self.num(999), self.rand.choice(('linux', 'win', 'osx')))
+                for _ in range(self.size)]
+
+    def mixed(self):
+        vers = self.releases() + self.prereleases() + self.builds()
+        self.rand.shuffle(vers)
+        return vers[:self.size]
+
+    def selectors(self):
+        forms = (
+            lambda: '>=%s <%s' % (self.triple(), self.triple()),
+            lambda: '~%d.%d' % (self.num(5), self.num()),
+            lambda: '%d.x || %d.%d.*' % (self.num(5), self.num(5), self.num()),
+            lambda: '%s - %s' % (self.triple(), self.triple()),
+            lambda: '>%s <%s !=%s || ~%d || <=%s-rc.1' % (self.triple(), self.triple(),
+                                                         self.triple(), self.num(5),
+                                                         self.triple()),
+            lambda: '!%s >=%s-beta.2+b.7' % (self.triple(), self.triple()),
+        )
+        return [self.rand.choice(forms)() for _ in range(self.size)]
+
+
+# Every benchmark returns a function processing a list of items, the list of items and whether
+# the items may be split into batches (sorting, for example, must see all of them at once).
+def bench_parse(corpus):
+    return (lambda vers: [SemVer(v) for v in vers]), corpus.mixed(), True
+
+
+def bench_parse_many(corpus):
+    return (lambda vers: list(SemVer.parse_many(vers))), corpus.mixed(), True
+
+
+def bench_compare_releases(corpus):
+    vers = [SemVer(v) for v in corpus.releases()]
+    return (lambda pairs: [a < b for a, b in pairs]), list(zip(vers, vers[1:] + vers[:1])), True
+
+
+def bench_compare_prereleases(corpus):
+    vers = [SemVer(v) for v in corpus.prereleases()]
+    return (lambda pairs: [a < b for a, b in pairs]), list(zip(vers, vers[1:] + vers[:1])), True
+
+
+def bench_sort(corpus):
+    # Fresh objects every round, sorting must not benefit from keys cached by the previous one
+    return (lambda vers: sorted([SemVer(v) for v in vers])), corpus.mixed(), False
+
+
+def bench_sel_parse(corpus):
+    return (lambda sels: [SemSel(s) for s in sels]), corpus.selectors(), True
+
+
+def bench_sel_matches(corpus):
+    pairs = list(zip([SemSel(s) for s in corpus.selectors()],
+                     [SemVer(v) for v in corpus.mixed()]))
+    return (lambda pairs: [s.matches(v) for s, v in pairs]), pairs, True
+
+
+def bench_satisfies(corpus):
+    # A small set of recurring selector strings, like in a resolver's hot loop
+    sels = corpus.selectors()[:20] * (corpus.size // 20 + 1)
+    pairs = list(zip(sels, [SemVer(v) for v in corpus.mixed()]))
+    return (lambda pairs: [v.satisfies(s) for s, v in pairs]), pairs, True
+
+
+BENCHMARKS = [(name[len('bench_'):], func) for name, func in sorted(globals().items())
+              if name.startswith('bench_')]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def run(func, items, splittable, rounds, batch):
+    """Run a benchmark and return a dict with its results. The first (warm-up) round is not timed.
+
+    Items are processed in batches of `batch` items (if splittable), the per-op latency of each
+    batch is its time divided by its size.
+    """
+    if not splittable:
+        batch = len(items)
+    batches = [items[i:i + batch] for i in range(0, len(items), batch)]
+
+    for b in batches:
+        func(b)
+    total, per_op = 0, []
+    for _ in range(rounds):
+        for b in batches:
+            start = default_timer()
+            func(b)
+            t = default_timer() - start
+            total += t
+            per_op.append(t / len(b))
+
+    return dict(
+        ops_per_sec=len(items) * rounds / total,
+        latency=dict(('p%d' % p, percentile(per_op, p)) for p in (50, 90, 99)),
+        min=min(per_op),
+        rounds=rounds,
+        size=len(items),
+        batch=len(batches[0]),
+    )
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m _bench',
+                                     description="Benchmark parsing, comparing, sorting and "
+                                                 "selector matching of versions.")
+    parser.add_argument('-n', '--size', type=int, default=10000, help="items per round")
+    parser.add_argument('-r', '--rounds', type=int, default=20, help="rounds per benchmark")
+    parser.add_argument('-b', '--batch', type=int, default=100, help="items per timed batch")
+    parser.add_argument('-k', '--filter', metavar='PATTERN', help="only run matching benchmarks")
+    parser.add_argument('--json', metavar='FILE', help="also write the results to FILE")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print("%-22s %14s %12s %12s %12s" % ("benchmark", "ops/sec", "p50 (us)", "p90 (us)",
+                                         "p99 (us)"))
+    for name, setup in BENCHMARKS:
+        if args.filter and not re.search(args.filter, name):
+            continue
+        func, items, splittable = setup(Corpus(args.size))
+        res = results[name] = run(func, items, splittable, args.rounds, args.batch)
+        lat = res['latency']
+        print("%-22s %14.0f %12.3f %12.3f %12.3f" % (name, res['ops_per_sec'], lat['p50'] * 1e6,
+                                                     lat['p90'] * 1e6, lat['p99'] * 1e6))
+        sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(python=platform.python_version(),
+                           implementation=platform.python_implementation(),
+                           benchmarks=results),
+                      f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
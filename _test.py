@@ -16,10 +16,15 @@ CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
 
+import os
+import pickle
+import tempfile
 from sys import version_info
 from random import shuffle
 
-from semver import *  # SemVer, SemSel, SelParseError
+from semver import *  # SemVer, SemSel, SelParseError, VersionIndex, VersionArray, ...
+from semver import SemComparator
+from resolver import Resolver, MemoryProvider, ResolutionError
 
 # Use unittest2 for Python <2.7
 if version_info < (2, 7, 0):
@@ -27,6 +32,22 @@ if version_info < (2, 7, 0):
 else:
     import unittest
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import concurrent.futures as futures
+except ImportError:
+    futures = None
+
+try:
+    import asyncio
+    from aioresolver import AsyncResolver, AsyncMemoryProvider
+except (ImportError, SyntaxError):  # Python <3.5
+    AsyncResolver = None
+
 
 class CompTests(unittest.TestCase):
     versions = """
@@ -96,6 +117,20 @@ class CompTests(unittest.TestCase):
 
         self.assertEqual(sorted(vers_rand), vers)
 
+    def test_sort_key(self):
+        vers = self.versions[:]
+        while vers == self.versions:
+            shuffle(vers)
+
+        self.assertEqual(sorted(vers, key=SemVer.sort_key), self.versions)
+        self.assertEqual(SemVer.sort_key("1.2.3-4"), SemVer.sort_key(SemVer("1.2.3-4")))
+        self.assertRaises(TypeError, SemVer.sort_key, 123)
+
+    def test_hash(self):
+        self.assertEqual(len(set(SemVer(v) for v in self.versions * 2)), len(self.versions))
+        self.assertEqual(SemVer("1.0.0-01"), SemVer("1.0.0-1"))
+        self.assertEqual(hash(SemVer("1.0.0-01")), hash(SemVer("1.0.0-1")))
+
 
 class ValidityTests(unittest.TestCase):
     def valid(self, ver):
@@ -135,6 +170,20 @@ class InvalidityTests(unittest.TestCase):
         self.invalid(" b 20.0.0")
         self.invalid("=0.0.0")
 
+    def test_scan(self):
+        # The fast path must never accept what the regex rejects, nor split differently
+        for v in ("0.0.0", "1.2.3-", "1.2.3+", "1.2.3-+", "1.2.3-a-b.0+c-d.1", "01.2.3-.a",
+                  "1.2.3-a..b", "1.2.3+a.", "1.2", "1.2.3.4", "1..3", "1.2.3\n", u"1.2.\u0663",
+                  "1.2.3-a+b+c", "1.2.3-a_b", " 1.2.3", "1.2.3+-"):
+            m = SemVer._match_regex.match(v)
+            g = SemVer._scan(v)
+            if g is not None:
+                self.assertEqual(g, [int(x) for x in m.groups()[:3]] + list(m.groups()[3:]))
+            if m:
+                self.assertEqual(list(SemVer(v)), g or list(SemVer._parse(v)))
+            else:
+                self.assertRaises(ValueError, SemVer, v)
+
 
 class ConstructorTests(unittest.TestCase):
     def returns(self, ret, *args, **kwargs):
@@ -306,6 +355,23 @@ class SelectorTests(unittest.TestCase):
         '''
         self.str_sel_test(t)
 
+    def test_simplify(self):
+        t = '''
+            >=1.0.0 >=1.2.0 <3.0.0 <2.5.0 || 1.3.x, 1.2.0 - 2.5.0 !=2.5.0: >=1.2.0 <2.5.0
+            >2.0.0 <1.0.0, <0.0.0-, 1.0.0 - 0.1.0:                         <0.0.0-
+            *, >=0.0.0- || 1.x, <1.0.0 || >=1.0.0:                         >=0.0.0-
+            =1.2.3, 1.2.3 - 1.2.3, >=1.2.3 <=1.2.3 || =1.2.3:              =1.2.3
+            !=1.2.3, >1.2.3 || <1.2.3:                                     <1.2.3 || >1.2.3
+            ~1 || ~2, 2.x || >=1.0.0- <2.0.0-:                             >=1.0.0- <3.0.0-
+            <=2.0.0-rc.1 >1.0.0+b.1:                                       >1.0.0+b.1 <=2.0.0-rc.1
+        '''
+        for l in t.splitlines():
+            if l.strip():
+                k, v = l.split(':')
+                for s in k.strip().split(', '):
+                    self.assertEqual(str(SemSel(s).simplify()), v.strip())
+                    self.assertEqual(str(SemSel(v.strip()).simplify()), v.strip())
+
     def test_invalids(self):
         t = '''
             ValueError: >1.0, >=1, >v1.2.3, >*
@@ -404,6 +470,62 @@ class MatchTests(unittest.TestCase):
         '''
         self.str_match_test(t)
 
+    def test_compiled(self):
+        # The compiled intervals must agree with evaluating every comparator
+        sels = ('>=2.2.0 <2.4.0 || 1.x', '!=1.0.0 !2.0.0', '~1.2 || <=0.0.1-alpha',
+                '1.0.0 - 2.0.0-rc.1 !=1.5.0+b.1', '<1.0.0 >2.0.0 || 1.1.2-', '*',
+                '>1.0.0-9 <=1.0.0--a')
+        vers = [SemVer(v) for v in CompTests.versions + '''
+            0.0.1-alpha 1.0.0-rc.1 1.0.0+b 1.2.0 1.5.0 1.5.0+b.1 2.0.0-rc.1 2.0.0+
+            2.3.9 2.4.0- 3.0.0 1.0.0-1 1.0.0-9 1.0.0-10a 1.0.0--a 1.0.0-9.a
+        '''.split()]
+        # Numeric identifiers are lower than alphanumeric ones
+        self.assertTrue(SemVer("1.0.0-9") < SemVer("1.0.0-10a"))
+        self.assertTrue(SemVer("1.0.0-1") < SemVer("1.0.0--a"))
+        for s in sels:
+            sel = SemSel(s)
+            for v in vers:
+                self.assertEqual(bool(sel.matches(v)), sel._chunk.matches(v))
+
+    def test_specialize(self):
+        sels = ('>=2.2.0 <2.4.0 || 1.x', '!=1.0.0 !2.0.0', '<0.0.0-', '*',
+                '~0 || ~1.2 || ~3 || 4.0.0-rc.1 || >5.0.0 <6.0.0 !=5.5.0 || 8.x || >9.0.0+b')
+        vers = [SemVer(v) for v in CompTests.versions + '''
+            0.0.0- 1.2.0 2.3.9 3.1.0 4.0.0-rc.1 5.5.0 5.6.0 8.0.0 9.0.0+b 9.0.0+c 10.0.0
+        '''.split()]
+        for s in sels:
+            sel, spec = SemSel(s), SemSel(s)
+            self.assertTrue(spec.specialize() is spec)
+            self.assertTrue(spec.specialize() is spec)
+            for v in vers:
+                self.assertEqual(spec.matches(v), sel.matches(v))
+                self.assertEqual(v.satisfies(spec), v.satisfies(sel))
+
+    def test_streaming(self):
+        sel = SemSel('~1.2 || 2.0.0-rc.1')
+        vers = '1.2.0 0.9.0 1.2.5 2.0.0-rc.1 1.2.5+b 1.3.0 1.2.3'.split()
+        self.assertEqual(sel.matches(v for v in vers), sel.matches(*vers))
+        self.assertEqual(sel.matches(vers), ['1.2.0', '1.2.5', '2.0.0-rc.1', '1.2.5+b', '1.2.3'])
+        self.assertEqual(sel.matches(SemVer('1.2.0')), [SemVer('1.2.0')])
+
+        # Stops early, the invalid version is never parsed
+        it = sel.iter_matches(iter(vers + ['invalid']))
+        self.assertEqual(next(it), '1.2.0')
+        self.assertEqual(next(it), '1.2.5')
+        self.assertRaises(ValueError, list, it)
+
+        self.assertEqual(sel.max_satisfying(v for v in vers), '2.0.0-rc.1')
+        self.assertEqual(sel.min_satisfying(iter(vers)), '1.2.0')
+        self.assertEqual(SemSel('>3.0.0').max_satisfying(vers), None)
+        self.assertEqual(SemSel('>3.0.0').min_satisfying([]), None)
+        self.assertEqual(sel.top_k(iter(vers), 3), ['2.0.0-rc.1', '1.2.5+b', '1.2.5'])
+        self.assertEqual(sel.top_k(vers, 10), sorted(sel.matches(vers), key=SemVer,
+                                                     reverse=True))
+        self.assertEqual(sel.top_k(vers, 0), [])
+        self.assertEqual(sel.top_k(['1.2.0', SemVer('1.2.0'), '1.2.1'], 2),
+                         ['1.2.1', '1.2.0'])
+        self.assertRaises(TypeError, sel.max_satisfying, [1])
+
 
 class GetItemTests(unittest.TestCase):
     def equals(self, what, to):
@@ -457,5 +579,730 @@ class GetItemTests(unittest.TestCase):
         self.equals(s.build, '6')
         self.assertRaises(AttributeError, lambda: s.bb)
 
+    def test_parts(self):
+        s = SemVer("1.2.3-alpha.20240101.1234+b-7.007")
+
+        self.equals(s.prerelease_parts, ('alpha', 20240101, 1234))
+        self.equals(s.build_parts, ('b-7', 7))
+        self.equals(SemVer("1.2.3").prerelease_parts, None)
+        self.equals(SemVer("1.2.3").build_parts, None)
+        self.equals(SemVer("1.2.3-+").prerelease_parts, ())
+        self.equals(SemVer("1.2.3-+").build_parts, ())
+        self.assertTrue(s.prerelease_parts[0] is SemVer("2.0.0-alpha").prerelease_parts[0])
+
+
+class VersionIndexTests(unittest.TestCase):
+    vers = CompTests.versions + "0.1.0 1.2.0 1.2.0 1.5.0-rc.1 2.1.0".split()
+    sels = ('>=1.0.0 <2.0.0', '~1.1.2 || 2.x', '!=1.2.0', '<0.0.0-', '*', '>3.0.0')
+
+    def test_queries(self):
+        vers = list(self.vers)
+        shuffle(vers)
+        idx = VersionIndex(vers)
+        self.assertEqual(len(idx), len(vers))
+        self.assertEqual(list(idx), sorted(SemVer(v) for v in vers))
+
+        for s in self.sels:
+            scan = [SemVer(v) for v in SemSel(s).matches(*vers)]
+            self.assertEqual(idx.matching(s), sorted(scan))
+            self.assertEqual(idx.count(SemSel(s)), len(scan))
+            self.assertEqual(idx.max_satisfying(s), max(scan) if scan else None)
+            self.assertEqual(idx.min_satisfying(s), min(scan) if scan else None)
+
+    def test_add(self):
+        idx = VersionIndex()
+        for v in self.vers:
+            idx.add(v)
+        self.assertEqual(list(idx), sorted(SemVer(v) for v in self.vers))
+        self.assertRaises(TypeError, idx.add, 123)
+
+    def test_lookup(self):
+        idx = VersionIndex(self.vers)
+        self.assertEqual(idx.index("1.2.0"), idx.bisect_left("1.2.0"))
+        self.assertEqual(idx.bisect_right("1.2.0") - idx.bisect_left("1.2.0"), 2)
+        self.assertTrue(SemVer("1.1.2+") in idx)
+        self.assertFalse("1.1.3" in idx)
+        self.assertRaises(ValueError, idx.index, "1.1.3")
+        self.assertEqual(idx.bisect_left("0.0.0-"), 0)
+        self.assertEqual(idx.bisect_right("9.0.0"), len(idx))
+
+
+class MappedVersionIndexTests(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_queries(self):
+        vers = VersionIndexTests.vers + [str(2 ** 64 - 1) + ".0.0-rc.1+"]
+        idx = VersionIndex(vers)
+        MappedVersionIndex.write(self.path, reversed(vers))
+        with MappedVersionIndex(self.path) as mapped:
+            self.assertEqual(len(mapped), len(vers))
+            self.assertEqual(list(mapped), list(idx))
+            for s in VersionIndexTests.sels:
+                self.assertEqual(mapped.matching(s), idx.matching(s))
+                self.assertEqual(mapped.count(s), idx.count(s))
+                self.assertEqual(mapped.max_satisfying(s), idx.max_satisfying(s))
+                self.assertEqual(mapped.min_satisfying(s), idx.min_satisfying(s))
+            for v in vers + ["1.1.3", "0.0.0-", "1.1.2-zeta"]:
+                self.assertEqual(mapped.bisect_left(v), idx.bisect_left(v))
+                self.assertEqual(mapped.bisect_right(v), idx.bisect_right(v))
+                self.assertEqual(v in mapped, v in idx)
+            self.assertRaises(TypeError, mapped.add, "1.0.0")
+
+    def test_errors(self):
+        MappedVersionIndex.write(self.path, [])
+        with MappedVersionIndex(self.path) as mapped:
+            self.assertEqual(list(mapped), [])
+            self.assertEqual(mapped.max_satisfying('*'), None)
+
+        self.assertRaises(ValueError, MappedVersionIndex.write, self.path, [str(2 ** 64) + ".0.0"])
+        with open(self.path, 'wb') as f:
+            f.write(b"1.0.0\n" * 10)
+        self.assertRaises(ValueError, MappedVersionIndex, self.path)
+
+
+class ParseManyTests(unittest.TestCase):
+    lines = ["1.0.0", " 1.2.3-beta+b.1\n", "", "1.2", "2.0.0\r\n", "x.y.z"]
+
+    def test_parse_many(self):
+        vers = list(SemVer.parse_many(self.lines, errors='skip'))
+        self.assertEqual(vers, [SemVer("1.0.0"), SemVer("1.2.3-beta+b.1"), SemVer("2.0.0")])
+        self.assertTrue(all(type(v) is SemVer for v in vers))
+        self.assertEqual(str(vers[1]), "1.2.3-beta+b.1")
+
+        self.assertRaises(ValueError, list, SemVer.parse_many(self.lines))
+        self.assertRaises(ValueError, list, SemVer.parse_many(self.lines, errors='collect'))
+        self.assertRaises(ValueError, list, SemVer.parse_many(self.lines, errors='ignore'))
+        self.assertRaises(TypeError, list, SemVer.parse_many([1]))
+
+        failed = []
+        vers = list(SemVer.parse_many(self.lines, errors='collect', failed=failed))
+        self.assertEqual(len(vers), 3)
+        self.assertEqual(failed, [(4, "1.2"), (6, "x.y.z")])
+
+        self.assertEqual(list(SemVer.parse_many(["v1.0.0 stable"], clean=True)),
+                         [SemVer("1.0.0")])
+
+    def test_parse_file(self):
+        import io
+        data = '\n'.join(self.lines * 500)
+        failed = []
+        for chunksize in (1, 7, 1 << 20):
+            del failed[:]
+            f = io.BytesIO(data.encode('ascii'))
+            vers = list(SemVer.parse_file(f, errors='collect', failed=failed,
+                                          chunksize=chunksize))
+            self.assertEqual(len(vers), 1500)
+            self.assertEqual(vers[:3], [SemVer("1.0.0"), SemVer("1.2.3-beta+b.1"),
+                                        SemVer("2.0.0")])
+            self.assertEqual(len(failed), 1000)
+            self.assertEqual(failed[-1], (len(data.split('\n')), "x.y.z"))
+
+        # Paths are read like binary files, undecodable lines are invalid versions
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(b"1.0.0\n\xff\xfe\n2.0.0\n")
+            self.assertEqual(list(SemVer.parse_file(path, errors='skip')),
+                             [SemVer("1.0.0"), SemVer("2.0.0")])
+        finally:
+            os.remove(path)
+
+    def test_finditer(self):
+        import io
+        text = "build 1.0.0 ok; deps: lib@12.34.56-rc.1+b.7, x2.0.0-\n3.0 v4.5.6+ end"
+        expected = [(6, "1.0.0"), (26, "12.34.56-rc.1+b.7"), (46, "2.0.0-"), (58, "4.5.6+")]
+        found = lambda it: [(o, str(v)) for o, v in it]
+
+        self.assertEqual(found(SemVer.finditer(text)), expected)
+        self.assertEqual(found(SemVer.finditer(text.encode('ascii'))), expected)
+        self.assertTrue(all(type(v) is SemVer and type(v.prerelease or '') is str
+                            for o, v in SemVer.finditer(text.encode('ascii'))))
+        for chunksize in (1, 2, 5, 1 << 20):  # versions straddle chunk boundaries
+            self.assertEqual(found(SemVer.finditer(io.BytesIO(text.encode('ascii')), chunksize)),
+                             expected)
+            self.assertEqual(found(SemVer.finditer(io.StringIO(u'' + text), chunksize)),
+                             expected)
+        self.assertRaises(TypeError, list, SemVer.finditer(42))
+
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(text.encode('ascii'))
+            with open(path, 'rb') as f:  # memory-mapped, from the current position
+                f.seek(10)
+                self.assertEqual(found(SemVer.finditer(f)),
+                                 [(o - 10, v) for o, v in expected[1:]])
+            if version_info >= (3, 6):
+                import pathlib
+                self.assertEqual(found(SemVer.finditer(pathlib.Path(path))), expected)
+        finally:
+            os.remove(path)
+
+
+class CacheTests(unittest.TestCase):
+    def tearDown(self):
+        SemVer.disable_cache()
+
+    def test_intern(self):
+        self.assertEqual(SemVer.cache_info(), (0, 0, 0, 0))
+        SemVer.enable_cache(2)
+        a = SemVer("1.0.0")
+        self.assertTrue(SemVer("1.0.0") is a)
+        self.assertTrue(SemVer("1.0.0", False) is a)
+        self.assertFalse(SemVer("x 1.0.0", True) is a)
+        self.assertEqual(SemVer("x 1.0.0", True), a)
+        self.assertEqual(SemVer.cache_info(), (3, 2, 2, 2))
+
+        # "1.0.0" is the least recently used entry and evicted
+        SemVer("2.0.0")
+        self.assertFalse(SemVer("1.0.0") is a)
+        self.assertTrue(next(SemVer.parse_many(["2.0.0"])) is SemVer("2.0.0"))
+
+        SemVer.cache_clear()
+        self.assertEqual(SemVer.cache_info(), (0, 0, 2, 0))
+        self.assertRaises(ValueError, SemVer, "1.0")
+        self.assertRaises(TypeError, SemVer, "1.0.0", None)
+        self.assertRaises(ValueError, SemVer.enable_cache, 0)
+
+
+class CompileTests(unittest.TestCase):
+    def test_compile(self):
+        SemSel.cache_clear()
+        sel = SemSel.compile(">=1.2.0 <2.0.0")
+        self.assertTrue(SemSel.compile(">=1.2.0 <2.0.0") is sel)
+        self.assertEqual(SemSel.cache_info()[:2], (1, 1))
+
+        self.assertTrue(SemVer("1.5.0").satisfies(">=1.2.0 <2.0.0"))
+        self.assertFalse(SemVer("2.0.0").satisfies(">=1.2.0 <2.0.0"))
+        self.assertEqual(SemSel.cache_info()[:2], (3, 1))
+
+        self.assertRaises(SelParseError, SemSel.compile, "1.2.3 -")
+        self.assertRaises(TypeError, SemSel.compile, 123)
+        self.assertEqual(SemSel.cache_info().currsize, 1)
+
+        SemSel.cache_clear()
+        self.assertEqual(SemSel.cache_info()[::3], (0, 0))
+
+
+class VersionArrayTests(unittest.TestCase):
+    def test_array(self):
+        vers = CompTests.versions[:]
+        shuffle(vers)
+        arr = VersionArray(vers)
+        self.assertEqual(len(arr), len(vers))
+        self.assertEqual(list(arr), [SemVer(v) for v in vers])
+        self.assertEqual(arr[0], SemVer(vers[0]))
+        self.assertEqual(arr[-1], SemVer(vers[-1]))
+        self.assertEqual(list(arr[2:5]), [SemVer(v) for v in vers[2:5]])
+        self.assertTrue(isinstance(arr[2:5], VersionArray))
+
+        arr.sort()
+        self.assertEqual([str(v) for v in arr], CompTests.versions)
+        arr.sort(reverse=True)
+        self.assertEqual([str(v) for v in arr], CompTests.versions[::-1])
+
+    def test_append(self):
+        arr = VersionArray()
+        arr.append("1.2.3-beta+b.1")
+        arr.append(SemVer("2.0.0-beta"))
+        arr.extend(["3.0.0", SemVer("0.1.0"), "1.0.0-beta"])
+        arr.append(SemVer(2 ** 70, 0, 0))
+        self.assertEqual([str(v) for v in arr], ["1.2.3-beta+b.1", "2.0.0-beta", "3.0.0",
+                                                 "0.1.0", "1.0.0-beta", "%d.0.0" % 2 ** 70])
+        self.assertEqual(len(arr._strings), 2)
+        arr.sort()
+        self.assertEqual(arr[-1].major, 2 ** 70)
+
+        self.assertRaises(TypeError, arr.append, 1)
+        self.assertRaises(ValueError, arr.append, "1.0")
+
+    def test_extend_batches(self):
+        # Strings are parsed in batches, not all collected first
+        arr, pending = VersionArray(), []
+
+        def lines():
+            for i in range(3 * VersionArray._batch_size + 5):
+                pending.append(i + 1 - len(arr))
+                yield "1.%d.0\n" % i
+
+        arr.extend(lines())
+        self.assertEqual(len(arr), 3 * VersionArray._batch_size + 5)
+        self.assertEqual(max(pending), VersionArray._batch_size)
+        self.assertEqual(arr[-1], SemVer("1.%d.0" % (len(arr) - 1)))
+
+
+class MaskTests(unittest.TestCase):
+    vers = CompTests.versions + "0.0.0- 1.0.0-rc.1 1.0.0+b.1 1.1.2-beta.1 2.0.0- 2.0.0+".split()
+    sels = ('>=1.0.0 <2.0.0', '~1.1.2 || 2.x', '!=1.1.2-beta', '>1.1.2-beta <=1.1.2+build.2',
+            '<0.0.0-', '*', '!1.1.2 >0.0.1 || =2.0.10')
+
+    def check(self, use_numpy):
+        arr = VersionArray(self.vers)
+        for s in self.sels:
+            sel = SemSel(s)
+            expected = [bool(sel.matches(SemVer(v))) for v in self.vers]
+            self.assertEqual(list(sel.mask(arr, use_numpy)), expected)
+            self.assertEqual(list(sel.mask(self.vers, use_numpy)), expected)
+
+    def test_python(self):
+        self.check(False)
+        self.assertEqual(SemSel("1.x").mask([], False), [])
+        self.assertRaises(TypeError, SemSel("1.x").mask, [1], False)
+
+    @unittest.skipUnless(numpy, "Requires NumPy")
+    def test_numpy(self):
+        self.check(True)
+        self.assertEqual(SemSel("1.x").mask(VersionArray(["1.0.0"]), True).dtype, bool)
+
+
+class InstrumentationTests(unittest.TestCase):
+    def test_stats(self):
+        orig = SemSel.__dict__['matches'], SemVer.__dict__['_parse']
+        slow = []
+        with Instrumentation(lambda *a: slow.append(a), threshold=0) as inst:
+            sel = SemSel(">=1.0.0 <2.0.0")
+            self.assertTrue(sel.matches("1.2.0"))
+            SemVer("1.3.0").satisfies(sel)
+            SemComparator('>', SemVer("1.0.0")).matches(SemVer("1.1.0"))
+            self.assertTrue(SemVer("1.0.0") < SemVer("2.0.0"))
+            sorted([SemVer("1.2.0"), SemVer("1.0.0"), SemVer("1.1.0")])
+
+        self.assertTrue((SemSel.__dict__['matches'], SemVer.__dict__['_parse']) == orig)
+        stats = inst.stats()
+        self.assertEqual(stats['SemSel._parse'].calls, 1)
+        self.assertEqual(stats['SemSel.matches'].calls, 1)
+        self.assertEqual(stats['SemVer.satisfies'].calls, 1)
+        self.assertEqual(stats['SemComparator.matches'].calls, 1)
+        self.assertEqual(stats['SemSel._contains'].calls, 2)
+        self.assertEqual(stats['SemVer.__gt__'].calls, 1)  # by SemComparator.matches
+        self.assertTrue(stats['SemVer.__lt__'].calls >= 3)
+        self.assertEqual(stats['SemVer._parse'].calls, 11)
+        self.assertTrue(stats['SemVer._parse'].seconds > 0)
+        self.assertEqual([a[:2] for a in slow], [('SemSel._parse', ">=1.0.0 <2.0.0"),
+                                                 ('SemSel.matches', sel),
+                                                 ('SemVer.satisfies', sel)])
+
+        # Disabled, nothing is recorded anymore
+        SemSel(">1.0.0")
+        self.assertEqual(inst.stats()['SemSel._parse'].calls, 1)
+        inst.reset()
+        self.assertEqual(inst.stats()['SemSel._parse'], (0, 0))
+
+    def test_nested(self):
+        outer, inner = Instrumentation(), Instrumentation()
+        with outer:
+            SemVer("1.0.0")
+            with inner:
+                SemVer("1.0.0")
+            SemVer("1.0.0")
+        self.assertEqual(outer.stats()['SemVer._parse'].calls, 3)
+        self.assertEqual(inner.stats()['SemVer._parse'].calls, 1)
+
+    def test_threads(self):
+        import threading
+        originals = dict(((klass, attr), klass.__dict__[attr]) for klass, attr, i in
+                         Instrumentation._targets)
+
+        def run():
+            for i in range(200):
+                with Instrumentation():
+                    SemVer("1.0.0")
+
+        threads = [threading.Thread(target=run) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(Instrumentation._active, [])
+        for klass, attr, i in Instrumentation._targets:
+            self.assertTrue(klass.__dict__[attr] is originals[klass, attr])
+
+
+class AlgebraTests(unittest.TestCase):
+    def test_operations(self):
+        a, b = SemSel(">=1.0.0 <2.0.0"), "~1.5 || >=3.0.0"
+        self.assertEqual(str(a.intersection(b)), ">=1.5.0- <1.6.0-")
+        self.assertEqual(str(a.intersection(b, "<1.5.3")), ">=1.5.0- <1.5.3")
+        self.assertEqual(str(a.union(b)), ">=1.0.0 <2.0.0 || >=3.0.0")
+        self.assertEqual(str(a.union()), str(a.simplify()))
+        self.assertEqual(str(a.complement()), "<1.0.0 || >=2.0.0")
+        self.assertEqual(str(SemSel("*").complement()), "<0.0.0-")
+        self.assertEqual(str(SemSel("!=1.0.0").complement()), "=1.0.0")
+
+    def test_predicates(self):
+        self.assertTrue(SemSel(">2.0.0 <1.0.0").is_empty())
+        self.assertTrue(SemSel(">1.0.0+ <1.0.1-").is_empty())
+        self.assertFalse(SemSel(">1.0.0 <1.0.1-").is_empty())
+
+        self.assertTrue(SemSel("~1.2").issubset("1.x"))
+        self.assertTrue(SemSel(">=1.2.0 <1.2.5").issubset("~1.2"))
+        self.assertFalse(SemSel(">=1.2.0 <1.3.0").issubset("~1.2"))
+        self.assertFalse(SemSel("~1.2").issubset(">=1.2.0 <1.3.0"))
+        self.assertTrue(SemSel("<0.0.0-").issubset("=1.0.0"))
+
+        self.assertTrue(SemSel("<1.0.0").overlaps(">=0.9.0-rc.1"))
+        self.assertFalse(SemSel("<1.0.0").overlaps(">=1.0.0"))
+        self.assertFalse(SemSel("!1.0.0").overlaps("1.0.0-beta"))
+        self.assertRaises(SelParseError, SemSel("*").overlaps, "1.2.3 -")
+
+
+class SelectorIndexTests(unittest.TestCase):
+    sels = ('>=1.0.0 <2.0.0', '~1.1.2 || 2.x', '!=1.1.2', '<0.0.0-', '*', '>1.1.2-beta <2.0.0-',
+            '!1.1.2 >0.0.1 || =2.0.10', '0.0.0-alpha.2 - 1.1.2-gamma')
+
+    def test_matching(self):
+        idx = SelectorIndex([(s, i) for i, s in enumerate(self.sels[:-1])] + [self.sels[-1]])
+        self.assertEqual(len(idx), len(self.sels))
+        for v in CompTests.versions:
+            expected = [s for s in self.sels if SemSel(s).matches(v)]
+            self.assertEqual([str(s) for s, p in idx.matching(v)],
+                             [str(SemSel(s)) for s in expected])
+
+        res = idx.matching("1.5.0")
+        self.assertEqual([p for s, p in res], [0, 2, 4, 5, 6])
+        self.assertRaises(TypeError, idx.matching, 1)
+
+    def test_add_remove(self):
+        idx = SelectorIndex()
+        handles = [idx.add(s, s) for s in self.sels * 20]
+        for h in handles[::2]:
+            idx.remove(h)
+        self.assertRaises(KeyError, idx.remove, handles[0])
+        self.assertEqual(len(idx), len(handles) // 2)
+        for v in CompTests.versions:
+            expected = [s for s in (self.sels * 20)[1::2] if SemSel(s).matches(v)]
+            self.assertEqual([p for s, p in idx.matching(v)], expected)
+
+
+class PackedTests(unittest.TestCase):
+    def test_packed(self):
+        vers = [SemVer(v) for v in CompTests.versions] + [SemVer("8388607.1048575.1048575")]
+        rel = [v for v in vers if v.packed is not None]
+        self.assertEqual([str(v) for v in rel], "0.0.1 1.0.0 1.1.2 2.0.0 2.0.10 "
+                                                 "8388607.1048575.1048575".split())
+        self.assertEqual(sorted(v.packed for v in rel), [v.packed for v in rel])
+        self.assertEqual([SemVer.from_packed(v.packed) for v in rel], rel)
+        self.assertEqual(SemVer("1.2.3").packed, 1 << 40 | 2 << 20 | 3)
+        self.assertTrue(SemVer("8388607.1048575.1048575").packed < 1 << 63)
+
+        for v in ("8388608.0.0", "0.1048576.0", "1.2.3-", "1.2.3+"):
+            self.assertEqual(SemVer(v).packed, None)
+        self.assertRaises(ValueError, SemVer.from_packed, -1)
+        self.assertRaises(ValueError, SemVer.from_packed, 1 << 63)
+        self.assertRaises(TypeError, SemVer.from_packed, "1")
+
+    def test_packed_ranges(self):
+        p = lambda v: SemVer(v).packed
+        r = lambda s: SemSel(s).packed_ranges()
+        self.assertEqual(r('>=1.2.3 <2.0.0'), [(p('1.2.3'), p('2.0.0'))])
+        self.assertEqual(r('>1.2.3 <=2.0.0-rc.1'), [(p('1.2.4'), p('2.0.0'))])
+        self.assertEqual(r('1.x !=1.5.0'), [(p('1.0.0'), p('1.5.0')), (p('1.5.1'), p('2.0.0'))])
+        self.assertEqual(r('~1.1 || ~1.2'), [(p('1.1.0'), p('1.3.0'))])
+        self.assertEqual(r('*'), [(0, 1 << 63)])
+        self.assertEqual(r('>=1.0.0-rc.1 <1.0.0'), [])
+        self.assertEqual(r('>1.1048575.1048575'), [(p('2.0.0'), 1 << 63)])
+
+        sels = ('>=2.2.0 <2.4.0 || 1.x', '!=1.0.0 !2.0.0', '~1.2 || <=0.0.1-alpha', '<1.1.2+')
+        for s in sels:
+            ranges = r(s)
+            for v in CompTests.versions + "1.2.0 1.5.0 2.3.9 2.4.0".split():
+                v = SemVer(v)
+                if v.packed is not None:
+                    self.assertEqual(bool(SemSel(s).matches(v)),
+                                     any(lo <= v.packed < hi for lo, hi in ranges))
+
+
+class MatchMatrixTests(unittest.TestCase):
+    sels = ('>=2.2.0 <2.4.0 || 1.x', '!=1.0.0 !2.0.0', '~1.2 || <=0.0.1-alpha', '<0.0.0-', '*',
+            '1.1.2 || 2.0.0')
+    vers = CompTests.versions[::-1] + "1.2.0 1.5.0 0.0.1-alpha 2.3.9 2.4.0".split()
+
+    def check(self, matrix, vers=vers):
+        self.assertEqual(len(matrix), len(self.sels))
+        for bits, s in zip(matrix, self.sels):
+            self.assertEqual([bits >> i & 1 for i in range(len(vers))],
+                             [int(bool(SemSel(s).matches(v))) for v in vers])
+            self.assertTrue(bits < 1 << len(vers))
+
+    def test_serial(self):
+        self.check(SemSel.match_matrix(self.sels, self.vers))
+        self.check(SemSel.match_matrix([SemSel(s) for s in self.sels],
+                                       [SemVer(v) for v in self.vers]))
+        self.check(SemSel.match_matrix(self.sels, sorted(self.vers, key=SemVer.sort_key)),
+                   sorted(self.vers, key=SemVer.sort_key))
+        self.assertEqual(SemSel.match_matrix([], self.vers), [])
+        self.assertEqual(SemSel.match_matrix(['*'], []), [0])
+        vers = [v + '\n' for v in self.vers]  # accepted by `SemVer()` as well
+        self.check(SemSel.match_matrix(self.sels, vers, chunksize=8), vers)
+
+    @unittest.skipIf(futures is None, "requires concurrent.futures")
+    def test_executor(self):
+        with futures.ThreadPoolExecutor(2) as executor:
+            self.check(SemSel.match_matrix(self.sels, self.vers, chunksize=3, executor=executor))
+        self.check(SemSel.match_matrix(self.sels, self.vers, chunksize=8, max_workers=2))
+
+        # The selectors are sent once per worker, not with every chunk
+        class Executor(futures.ThreadPoolExecutor):
+            def map(self, fn, tasks):
+                self.tasks = list(tasks)
+                return super(Executor, self).map(fn, self.tasks)
+
+        with Executor(3) as executor:
+            self.check(SemSel.match_matrix(self.sels, self.vers, chunksize=1, executor=executor))
+        self.assertEqual(len(executor.tasks), 3)
+        self.assertEqual(sum(len(chunks) for sels, chunks in executor.tasks),
+                         -(-len(self.vers) // 8))
+
+    def test_errors(self):
+        self.assertRaises(ValueError, SemSel.match_matrix, self.sels, ["1.0.0", ""])
+        self.assertRaises(ValueError, SemSel.match_matrix, self.sels, ["1.0.0", "1.0"])
+        self.assertRaises(ValueError, SemSel.match_matrix, self.sels, ["1.0.0\n2.0.0"])
+        self.assertRaises(ValueError, SemSel.match_matrix, self.sels, self.vers, 0)
+
+
+class PickleTests(unittest.TestCase):
+    def test_semver(self):
+        vers = [SemVer(v) for v in CompTests.versions]
+        for v in vers:
+            v._key  # cached attributes are not pickled
+            self.assertEqual(v.__reduce__(), (SemVer, (str(v),)))
+        for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(vers, proto)), vers)
+
+    def test_components(self):
+        # Created from components the parser would reject, these pickle as their fields
+        vers = [SemVer(1, 2, 3, prerelease='a..b'), SemVer(-1, 0, 0), SemVer(1, 2, 3, build='.x')]
+        for v in vers:
+            self.assertRaises(ValueError, SemVer, str(v))
+        vers.append(SemVer(1, 2, 3, build='x\n'))  # parses, but without the newline
+        self.assertEqual(SemVer(str(vers[-1])).build, 'x')
+        for v in vers:
+            for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+                copy = pickle.loads(pickle.dumps(v, proto))
+                self.assertEqual(tuple(copy), tuple(v))
+                self.assertEqual(copy, v)
+            self.assertRaises(ValueError, SemVer.dumps, [SemVer("1.0.0"), v])
+
+    def test_dumps(self):
+        vers = [SemVer(v) for v in CompTests.versions]
+        data = SemVer.dumps(vers)
+        self.assertTrue(isinstance(data, bytes))
+        self.assertEqual(SemVer.loads(data), vers)
+        self.assertEqual(SemVer.loads(SemVer.dumps(CompTests.versions)), vers)
+        self.assertEqual(SemVer.loads(SemVer.dumps([])), [])
+        self.assertRaises(ValueError, SemVer.loads, b"1.0.0\n1.0")
+
+    def test_semsel(self):
+        for s in ('1.1.2 || !2.0.0 !=2.0.10', '~1.2 || >=2.0.0 <3.0.0-rc', '1.x !1.1.2', '*'):
+            sel = SemSel(s)
+            for other in (sel, sel.complement(), sel.simplify(), SemSel(s).specialize()):
+                copy = pickle.loads(pickle.dumps(other))
+                self.assertEqual(copy._ivs, other._ivs)
+                for v in CompTests.versions:
+                    self.assertEqual(copy.matches(v), other.matches(v))
+
+    def test_version_array(self):
+        arr = VersionArray(CompTests.versions + ["1.0.0-alpha", str(1 << 70) + ".0.0"])
+        copy = pickle.loads(pickle.dumps(arr))
+        self.assertEqual(list(copy), list(arr))
+        copy.append("1.0.0-alpha")
+        self.assertEqual(len(copy._strings), len(arr._strings))
+
+
+class ResolverTests(unittest.TestCase):
+    packages = {
+        'app': {'1.0.0': {'lib': '>=1.0.0', 'util': '~1.2'},
+                '1.1.0': {'lib': '>=2.0.0', 'util': '>=0.9.0'}},
+        'lib': {'1.0.0': {}, '2.0.0': {'util': '<1.0.0'}, '2.1.0-rc.1': {'util': '<0.1.0'}},
+        'util': {'0.9.0': {}, '1.2.0': {}, '1.2.5': {'lib': '<2.0.0'}},
+    }
+
+    def valid(self, packages, requirements, solution):
+        need = [(p, s) for p, s in requirements.items()]
+        for p, v in solution.items():
+            need.extend(packages[p][str(v)].items())
+        for p, s in need:
+            self.assertTrue(SemSel(s).matches(solution[p]), (p, s, solution))
+
+    def test_resolve(self):
+        resolver = Resolver(MemoryProvider(self.packages))
+        for req in ({'app': '*'}, {'app': '1.1.0'}, {'util': '1.2.0', 'app': '*'}, {'lib': '2.x'}):
+            solution = resolver.resolve(req)
+            self.valid(self.packages, req, solution)
+        self.assertEqual(resolver.resolve({'app': '*'}),
+                         {'app': SemVer("1.1.0"), 'lib': SemVer("2.0.0"), 'util': SemVer("0.9.0")})
+        self.assertEqual(resolver.resolve({'app': '*', 'util': '>=1.0.0'}),
+                         {'app': SemVer("1.0.0"), 'lib': SemVer("1.0.0"), 'util': SemVer("1.2.5")})
+        self.assertEqual(resolver.resolve([('lib', '*'), ('lib', '<2.1.0-')]),
+                         {'lib': SemVer("2.0.0"), 'util': SemVer("0.9.0")})
+        self.assertEqual(resolver.resolve({}), {})
+
+    def test_conflict(self):
+        resolver = Resolver(MemoryProvider(self.packages))
+        self.assertRaises(ResolutionError, resolver.resolve, {'app': '1.1.0', 'util': '1.2.x'})
+        try:
+            resolver.resolve({'missing': '*'})
+        except ResolutionError as e:
+            self.assertEqual(e.package, 'missing')
+        else:
+            self.fail("ResolutionError not raised")
+
+    def test_backjump(self):
+        # Neither version of a works because of c, so b (decided first) is jumped over
+        packages = {
+            'root': {'1.0.0': {'a': '*', 'b': '*'}},
+            'a': {'1.0.0': {'c': '>=2.0.0'}, '2.0.0': {'c': '*'}},
+            'b': {'1.0.0': {}},
+            'c': {'1.0.0': {'e': '<1.0.0'}},
+            'e': {'1.0.0': {}},
+        }
+        resolver = Resolver(MemoryProvider(packages))
+        self.assertRaises(ResolutionError, resolver.resolve, {'root': '*'})
+        stats = resolver.stats
+        self.assertTrue(stats.backjumps >= 1)
+        self.assertEqual(stats.decisions, 5)
+
+    def test_memoized(self):
+        calls = []
+
+        class Provider(MemoryProvider):
+            def versions(self, package):
+                calls.append(package)
+                return super(Provider, self).versions(package)
+
+        resolver = Resolver(Provider(self.packages))
+        resolver.resolve({'app': '*'})
+        evaluations = resolver.stats.evaluations
+        self.assertTrue(resolver.stats.cache_hits > 0)
+        resolver.resolve({'app': '*'})
+        self.assertTrue(resolver.stats.evaluations < evaluations)
+        self.assertEqual(sorted(calls), ['app', 'lib', 'util'])
+
+    def test_deep(self):
+        # A chain longer than the recursion limit, the last package only allows the older
+        # version of the first, which the search decided at the very beginning
+        n = 1200
+        packages = dict(('p%d' % i, {'1.0.0': {'p%d' % (i + 1): '1.x'},
+                                     '2.0.0': {'p%d' % (i + 1): '2.x'}}) for i in range(n))
+        packages['p%d' % n] = {'1.0.0': {'p0': '1.x'}}
+        resolver = Resolver(MemoryProvider(packages))
+        solution = resolver.resolve({'p0': '*'})
+        self.assertEqual(len(solution), n + 1)
+        self.assertEqual(set(solution.values()), set([SemVer("1.0.0")]))
+        self.assertTrue(resolver.stats.backtracks >= n)
+
+
+@unittest.skipIf(AsyncResolver is None, "requires Python 3.5+")
+class AsyncResolverTests(unittest.TestCase):
+    def run_coro(self, coro):
+        if hasattr(asyncio, 'run'):
+            return asyncio.run(coro)
+        return asyncio.get_event_loop().run_until_complete(coro)
+
+    def test_resolve(self):
+        packages = ResolverTests.packages
+        for req in ({'app': '*'}, {'app': '*', 'util': '>=1.0.0'}, {'lib': '2.x'}):
+            for prefetch in (0, 1, 3):
+                resolver = AsyncResolver(AsyncMemoryProvider(packages), prefetch=prefetch)
+                self.assertEqual(self.run_coro(resolver.resolve(req)),
+                                 Resolver(MemoryProvider(packages)).resolve(req))
+
+        resolver = AsyncResolver(AsyncMemoryProvider(packages))
+        self.assertRaises(ResolutionError, self.run_coro,
+                          resolver.resolve({'app': '1.1.0', 'util': '1.2.x'}))
+        self.assertRaises(ValueError, AsyncResolver, AsyncMemoryProvider(packages), 0)
+
+    def test_fetching(self):
+        active = []
+
+        class Provider(AsyncMemoryProvider):
+            def versions(self, package):  # no `async def`, this file has to compile on Py2
+                active.append(1)
+                self.peak = max(getattr(self, 'peak', 0), len(active))
+                future = asyncio.ensure_future(super(Provider, self).versions(package))
+                future.add_done_callback(lambda f: active.pop())
+                return future
+
+        packages = {'root': {'1.0.0': dict(('p%d' % i, '*') for i in range(10))}}
+        for i in range(10):
+            packages['p%d' % i] = {'1.0.0': {'shared': '*'}, '2.0.0': {'shared': '<1.0.0'}}
+        packages['shared'] = {'1.0.0': {}}
+
+        provider = Provider(packages, latency=0.01)
+        resolver = AsyncResolver(provider, concurrency=3)
+        solution = self.run_coro(resolver.resolve({'root': '*'}))
+        self.assertEqual(solution['p0'], SemVer("1.0.0"))
+        self.assertEqual(provider.peak, 3)
+
+        stats = resolver.fetch_stats
+        # Every package's versions and the dependencies of the newest versions of root and p* are
+        # fetched during the crawl, those of all p*@1.0.0 in one batch after the search found
+        # 2.0.0 unusable, and that of shared@1.0.0 by the crawl that follows the batch
+        self.assertEqual(stats.restarts, 1)
+        self.assertEqual(stats.requests, 12 + 11 + 10 + 1)
+
+        self.run_coro(resolver.resolve({'root': '*'}))
+        self.assertEqual(resolver.fetch_stats.requests, 0)
+        self.assertTrue(resolver.fetch_stats.cache_hits > 0)
+
+
+class CommandLineTests(unittest.TestCase):
+    lines = "1.2.0\n v1.0.0 \nfoo\n2.0.0-rc.1\n1.2.0\n1.10.0\n"
+
+    def run_main(self, *argv):
+        import io
+        from semver import _main
+        stdout = io.StringIO() if version_info[0] == 3 else io.BytesIO()
+        status = _main(list(argv), io.BytesIO(self.lines.encode('ascii')), stdout)
+        return status, stdout.getvalue().split()
+
+    def test_filter(self):
+        self.assertEqual(self.run_main('--valid-only'),
+                         (0, ['1.2.0', '2.0.0-rc.1', '1.2.0', '1.10.0']))
+        self.assertEqual(self.run_main('--clean', '--valid-only', '-u', '-s', '<2.0.0'),
+                         (0, ['1.2.0', '1.0.0', '2.0.0-rc.1', '1.10.0']))
+        self.assertEqual(self.run_main('--valid-only', '--max', '-s', '~1'), (0, ['1.10.0']))
+        self.assertEqual(self.run_main('--clean', '--min'), (2, []))
+        self.assertEqual(self.run_main('--clean', '--valid-only', '--min'), (0, ['1.0.0']))
+        self.assertEqual(self.run_main('--valid-only', '-s', '>9.0.0'), (1, []))
+
+    def test_bad_selector(self):
+        import io
+        import sys
+        stderr, sys.stderr = sys.stderr, io.StringIO() if version_info[0] == 3 else io.BytesIO()
+        try:
+            for sel in ('1.2.3 -', 'foo', '>=1.0.0 ||'):
+                with self.assertRaises(SystemExit) as cm:
+                    self.run_main('-s', sel)
+                self.assertEqual(cm.exception.code, 2)
+                self.assertTrue("error:" in sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+
+    def test_sort(self):
+        expected = ['1.0.0', '1.2.0', '1.2.0', '1.10.0', '2.0.0-rc.1']
+        for limit in ('1', '2', '100'):  # merging temporary files and sorting in memory
+            self.assertEqual(self.run_main('--clean', '--valid-only', '--sort',
+                                           '--memory-limit', limit), (0, expected))
+            self.assertEqual(self.run_main('--clean', '--valid-only', '--sort', '-u',
+                                           '--memory-limit', limit),
+                             (0, expected[:2] + expected[3:]))
+
+    def test_files(self):
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write("3.0.0\n0.1.0\n")
+            self.assertEqual(self.run_main('--valid-only', '--sort', path, '-'),
+                             (0, ['0.1.0', '1.2.0', '1.2.0', '1.10.0', '2.0.0-rc.1', '3.0.0']))
+        finally:
+            os.remove(path)
+
+
 if __name__ == '__main__':
     unittest.main()
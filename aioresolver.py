@@ -0,0 +1,333 @@
+"""
+Copyright (c) 2013 FichteFoll
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions: The above copyright notice and this
+permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES
+OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+An asyncio front-end for the resolver of `resolver.py` with a concurrent, prefetching provider.
+Requires Python 3.5 or later.
+
+Example usage:
+    >>> provider = AsyncMemoryProvider({'app': {'1.0.0': {'lib': '1.x'}}, 'lib': {'1.2.0': {}}},
+    ...                                latency=0.05)
+    >>> asyncio.run(AsyncResolver(provider).resolve({'app': '*'}))
+    {'app': SemVer("1.0.0"), 'lib': SemVer("1.2.0")}
+
+Exported classes:
+    * AsyncResolver(object)
+        Resolves requirements against an asynchronous provider.
+    * AsyncMemoryProvider(object)
+        Serves package versions and dependencies from a dict after a delay.
+
+An asynchronous provider is any object with two coroutine methods, `versions(package)` and
+`dependencies(package, version)`, that return the same as those of a provider for `Resolver`.
+"""
+
+import asyncio
+from collections import namedtuple
+
+try:
+    from .semver import SemVer, SemSel, VersionIndex
+    from .resolver import Resolver, MemoryProvider, ResolutionError
+except (ImportError, ValueError, SystemError):  # not imported as part of the package
+    from semver import SemVer, SemSel, VersionIndex
+    from resolver import Resolver, MemoryProvider, ResolutionError
+
+
+__all__ = ('AsyncResolver', 'AsyncMemoryProvider', 'ResolutionError')
+
+
+_FetchStats = namedtuple("FetchStats", 'requests, cache_hits, prefetched, restarts')
+
+
+class _CachedProvider(object):
+    """Private. A synchronous provider that serves the metadata fetched by an AsyncResolver.
+
+    Metadata that has not been fetched yet is recorded in `missing` and served as no versions or
+    no dependencies, so that a search goes on and runs into everything else it lacks as well.
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self.missing = []
+
+    def versions(self, package):
+        key = ('versions', package)
+        if key not in self.cache:
+            self.missing.append(key)
+            return []
+        return self.cache[key]
+
+    def dependencies(self, package, version):
+        key = ('dependencies', package, version)
+        if key not in self.cache:
+            self.missing.append(key)
+            return []
+        return self.cache[key]
+
+
+class AsyncMemoryProvider(object):
+    """An asynchronous provider serving a `MemoryProvider`'s dict, each response after `latency`
+    seconds.
+
+    Constructor: AsyncMemoryProvider({'pkg': {'1.0.0': {'dep': '>=2.0.0'}}}, latency=0.01)
+    """
+    def __init__(self, packages, latency=0):
+        super(AsyncMemoryProvider, self).__init__()
+        self._provider = MemoryProvider(packages)
+        self.latency = latency
+
+    async def versions(self, package):
+        await asyncio.sleep(self.latency)
+        return self._provider.versions(package)
+
+    async def dependencies(self, package, version):
+        await asyncio.sleep(self.latency)
+        return self._provider.dependencies(package, version)
+
+
+class AsyncResolver(object):
+    """Resolves requirements like `Resolver`, fetching the metadata from an asynchronous provider.
+
+    Constructor: AsyncResolver(provider, concurrency=8, prefetch=1)
+
+    Before searching, the packages reachable from the requirements are crawled breadth-first. For
+    every package of the frontier the versions are fetched concurrently, then the dependencies of
+    its `prefetch` newest versions that match the selectors seen so far (the likely choices), which
+    yields the next frontier. The search itself runs synchronously on the fetched metadata.
+    Metadata it lacks, e.g. the dependencies of older versions after backtracking, is taken as
+    empty for the moment so that the search goes on and runs into everything else it lacks. All
+    of it is then fetched in one concurrent batch, together with the dependencies of the next
+    `prefetch` older versions of each package and whatever they lead to, and the search is
+    restarted; its candidate lists stay cached. The result of a search that lacked metadata is
+    never used.
+
+    At most `concurrency` requests are sent to the provider at the same time. Responses are cached
+    for the lifetime of the resolver and equal requests in flight are only sent once.
+
+    Information on this particular class and their instances:
+        - `stats` holds the search statistics of the last search (see `Resolver.stats`).
+        - `fetch_stats` holds the requests, cache hits, prefetched dependency lists and search
+          restarts of the last `resolve()` call.
+
+    Methods:
+        * resolve(requirements) (coroutine)
+    """
+    # Constructor
+    def __init__(self, provider, concurrency=8, prefetch=1):
+        """Parameters:
+            * provider
+                An asynchronous provider, see the module's doc string.
+            * concurrency = `8` (int; optional)
+                The maximum number of concurrent requests.
+            * prefetch = `1` (int; optional)
+                The number of versions per package whose dependencies are fetched speculatively.
+
+        Raises:
+            * ValueError
+                `concurrency` is not positive or `prefetch` is negative.
+        """
+        super(AsyncResolver, self).__init__()
+        if concurrency < 1:
+            raise ValueError("concurrency must be positive")
+        if prefetch < 0:
+            raise ValueError("prefetch must not be negative")
+
+        self.provider = provider
+        self.concurrency = concurrency
+        self.prefetch = prefetch
+        self._cache = {}     # ('versions', package) or ('dependencies', package, version): result
+        self._inflight = {}  # same keys: Future
+        self._indexes = {}   # package: VersionIndex
+        self._resolver = Resolver(_CachedProvider(self._cache))
+        self._counts = [0] * len(_FetchStats._fields)
+        self._semaphore = None
+
+    # Read-only attributes
+    @property
+    def stats(self):
+        """See `Resolver.stats`.
+        """
+        return self._resolver.stats
+
+    @property
+    def fetch_stats(self):
+        """Provider statistics of the last resolution, a namedtuple with the fields:
+            * requests:   requests sent to the provider
+            * cache_hits: requests answered from the cache (or by a request in flight)
+            * prefetched: dependency lists fetched speculatively
+            * restarts:   searches restarted because metadata was missing
+        """
+        return _FetchStats(*self._counts)
+
+    # Utility methods
+    async def resolve(self, requirements):
+        """Choose a version for every package that is required, directly or as a dependency.
+        Coroutine.
+
+        Parameters:
+            See `Resolver.resolve()`.
+
+        Raises:
+            See `Resolver.resolve()` and the exceptions of the provider.
+
+        Returns:
+            * dict: Package names mapped to the chosen SemVer.
+        """
+        self._counts = [0] * len(_FetchStats._fields)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        if isinstance(requirements, dict):
+            requirements = requirements.items()
+        requirements = [(package, self._resolver._selector(sel)) for package, sel in requirements]
+
+        await self._crawl(requirements)
+        missing = self._resolver.provider.missing
+        while True:
+            del missing[:]
+            try:
+                solution = self._resolver.resolve(requirements)
+            except ResolutionError:
+                if not missing:
+                    raise
+            else:
+                if not missing:
+                    return solution
+
+            self._counts[3] += 1
+            keys = self._forget(missing)
+            await self._fetch_missing(keys)
+
+    # Private methods
+    async def _fetch(self, key):
+        """Private. Do not touch. Coroutine.
+
+        Return the response for a cache key, requesting it from the provider if necessary.
+        """
+        if key in self._cache:
+            self._counts[1] += 1
+            return self._cache[key]
+        future = self._inflight.get(key)
+        if future is not None:
+            self._counts[1] += 1
+            return await future
+
+        future = self._inflight[key] = asyncio.get_event_loop().create_future()
+        try:
+            async with self._semaphore:
+                self._counts[0] += 1
+                if key[0] == 'versions':
+                    result = [SemVer._coerce(v) for v in await self.provider.versions(key[1])]
+                else:
+                    result = await self.provider.dependencies(key[1], key[2])
+                    if isinstance(result, dict):
+                        result = result.items()
+                    result = [(dep, self._resolver._selector(sel)) for dep, sel in result]
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # nobody else might be waiting
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            self._cache[key] = result
+            future.set_result(result)
+            return result
+        finally:
+            del self._inflight[key]
+
+    async def _likely(self, package, sels, count):
+        """Private. Do not touch. Coroutine.
+
+        Return up to `count` of the newest versions of `package` that match all `sels`.
+        """
+        index = self._indexes.get(package)
+        if index is None:
+            index = self._indexes[package] = VersionIndex(await self._fetch(('versions',
+                                                                             package)))
+        if not count:
+            return []
+        merged = sels[0].intersection(*sels[1:]) if sels[1:] else sels[0]
+        return index.matching(merged)[:-count - 1:-1]
+
+    async def _crawl(self, requirements, sels=None):
+        """Private. Do not touch. Coroutine.
+
+        Fetch the versions of the packages reachable from `requirements`, a list of
+        `(package, SemSel)`, and the dependencies of their likely versions, breadth-first.
+        """
+        sels = {} if sels is None else sels
+        frontier = []
+        for package, sel in requirements:
+            if package not in sels:
+                frontier.append(package)
+            sels.setdefault(package, []).append(sel)
+
+        while frontier:
+            likely = await asyncio.gather(*(self._likely(p, sels[p], self.prefetch)
+                                            for p in frontier))
+            keys = [('dependencies', p, v) for p, vers in zip(frontier, likely) for v in vers]
+            self._counts[2] += sum(key not in self._cache for key in keys)
+            deps = await asyncio.gather(*(self._fetch(key) for key in keys))
+
+            frontier = []
+            for dep, sel in (pair for pairs in deps for pair in pairs):
+                if dep not in sels:
+                    frontier.append(dep)
+                sels.setdefault(dep, []).append(sel)
+
+    def _forget(self, missing):
+        """Private. Do not touch.
+
+        Drop what the resolver memoized for the `missing` metadata of the last search and return
+        the keys of the metadata, without duplicates.
+        """
+        resolver = self._resolver
+        keys = []
+        for key in missing:
+            if key in keys:
+                continue
+            keys.append(key)
+            if key[0] == 'versions':
+                resolver._indexes.pop(key[1], None)
+                for cands_key in [k for k in resolver._candidates if k[0] == key[1]]:
+                    del resolver._candidates[cands_key]
+            else:
+                resolver._deps.pop(key[1:], None)
+        return keys
+
+    async def _fetch_missing(self, keys):
+        """Private. Do not touch. Coroutine.
+
+        Fetch all the metadata a search missed at once. For dependencies, also prefetch those of
+        the next older versions of each package, then crawl on from everything fetched.
+        """
+        packages = [key[1] for key in keys if key[0] == 'versions']
+        dep_keys = []
+        for key in keys:
+            if key[0] != 'dependencies':
+                continue
+            package, ver = key[1:]
+            index = self._indexes.get(package)
+            if index is None:  # the search had the versions, so they are cached
+                index = self._indexes[package] = VersionIndex(self._cache[('versions', package)])
+            i = index.bisect_left(ver)
+            older = [('dependencies', package, v)
+                     for v in index._vers[max(0, i - self.prefetch):i][::-1]]
+            self._counts[2] += sum(k not in self._cache and k not in dep_keys and k not in keys
+                                   for k in older)
+            dep_keys.extend(k for k in [key] + older if k not in dep_keys)
+
+        deps = await asyncio.gather(*(self._fetch(k) for k in dep_keys))
+        await self._crawl([(package, SemSel('*')) for package in packages]
+                          + [pair for pairs in deps for pair in pairs])
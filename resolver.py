@@ -0,0 +1,338 @@
+"""
+Copyright (c) 2013 FichteFoll
+
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and
+associated documentation files (the "Software"), to deal in the Software without restriction,
+including without limitation the rights to use, copy, modify, merge, publish, distribute,
+sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions: The above copyright notice and this
+permission notice shall be included in all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES
+OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+A backtracking dependency resolver using SemSel and SemVer as the constraint layer.
+
+Example usage:
+    >>> provider = MemoryProvider({
+    ...     'app': {'1.0.0': {'lib': '>=1.0.0', 'util': '~1.2'}},
+    ...     'lib': {'1.0.0': {}, '2.0.0': {'util': '<1.0.0'}},
+    ...     'util': {'0.9.0': {}, '1.2.0': {}, '1.2.5': {}},
+    ... })
+    >>> Resolver(provider).resolve({'app': '*'})
+    {'app': SemVer("1.0.0"), 'lib': SemVer("1.0.0"), 'util': SemVer("1.2.5")}
+
+Exported classes:
+    * Resolver(object)
+        Computes a consistent assignment of versions to packages.
+    * MemoryProvider(object)
+        Serves package versions and dependencies from a dict.
+    * ResolutionError(Exception)
+        Raised when no consistent assignment exists.
+
+A provider is any object with two methods:
+    * versions(package)
+        Return an iterable of the package's versions (str or SemVer), empty if it is unknown.
+    * dependencies(package, version)
+        Return a dict (or iterable of pairs) mapping the packages a version depends on to
+        selectors (str or SemSel).
+"""
+
+import sys
+from collections import namedtuple
+
+try:
+    from .semver import SemVer, SemSel, VersionIndex
+except (ImportError, ValueError, SystemError):  # not imported as part of the package
+    from semver import SemVer, SemSel, VersionIndex
+
+
+__all__ = ('Resolver', 'MemoryProvider', 'ResolutionError')
+
+
+if sys.version_info[0] == 3:
+    basestring = str
+
+
+_Stats = namedtuple("Stats", 'decisions, backtracks, backjumps, evaluations, cache_hits')
+
+
+class ResolutionError(Exception):
+    """Raised when the requirements can not be satisfied.
+
+    Attributes:
+        * package (str)
+            The package for which no version could be chosen when the search gave up.
+        * selector (SemSel)
+            The merged selector the package's versions had to match then.
+    """
+    def __init__(self, package, selector):
+        super(ResolutionError, self).__init__("No version of '%s' satisfies '%s' and the "
+                                              "dependencies of the other packages"
+                                              % (package, selector))
+        self.package = package
+        self.selector = selector
+
+
+class MemoryProvider(object):
+    """A provider that serves package versions and dependencies from a dict.
+
+    Constructor: MemoryProvider({'pkg': {'1.0.0': {'dep': '>=2.0.0'}}})
+    """
+    def __init__(self, packages):
+        """Parameters:
+            * packages (dict)
+                Maps package names to dicts that map versions (str or SemVer) to the dependencies
+                of the version, each a dict of package names and selectors.
+
+        Raises:
+            See `SemVer.__new__` for invalid version strings.
+        """
+        super(MemoryProvider, self).__init__()
+        self._packages = dict((name, dict((SemVer._coerce(v), deps) for v, deps in vers.items()))
+                              for name, vers in packages.items())
+
+    def versions(self, package):
+        return list(self._packages.get(package, ()))
+
+    def dependencies(self, package, version):
+        return self._packages[package][SemVer._coerce(version)]
+
+
+class Resolver(object):
+    """Resolves requirements to one version per package, newest versions first.
+
+    Constructor: Resolver(MemoryProvider({...}))
+
+    The search assigns one package at a time, always the one with the fewest candidates left.
+    Candidates are tried newest-first. A candidate is rejected early when one of its
+    dependencies is not satisfied by an already assigned version or leaves a package without
+    candidates. Failures are explained by the packages whose versions caused them (conflict-directed
+    backjumping), so the search returns directly to the most recent responsible decision instead of
+    retrying unrelated ones.
+
+    The versions and dependencies of the provider are fetched once per resolver, and candidate
+    lists are memoized per package and merged selector. Reuse a resolver to keep these caches
+    across resolutions.
+
+    Information on this particular class and their instances:
+        - `stats` holds the search statistics of the last `resolve()` call.
+        - The search does not recurse, solutions may contain any number of packages.
+
+    Methods:
+        * resolve(requirements)
+    """
+    # Constructor
+    def __init__(self, provider):
+        """Parameters:
+            * provider
+                See the module's doc string.
+        """
+        super(Resolver, self).__init__()
+
+        self.provider = provider
+        self._indexes = {}     # package: VersionIndex
+        self._deps = {}        # (package, version): [(package, SemSel)]
+        self._merged = {}      # tuple of selector sources: SemSel
+        self._candidates = {}  # (package, merged selector source): [SemVer] newest first
+        self._counts = [0] * len(_Stats._fields)
+
+    # Read-only attributes
+    @property
+    def stats(self):
+        """Statistics of the last resolution, a namedtuple with the fields:
+            * decisions:   candidate versions tried
+            * backtracks:  candidates given up after they (or the search below them) failed
+            * backjumps:   levels left without trying further candidates, because their decision
+                           was not responsible for a failure
+            * evaluations: selectors evaluated, either against an assigned version or to compute
+                           a candidate list
+            * cache_hits:  candidate lists taken from the cache
+        """
+        return _Stats(*self._counts)
+
+    # Utility methods
+    def resolve(self, requirements):
+        """Choose a version for every package that is required, directly or as a dependency.
+
+        Parameters:
+            * requirements (dict or iterable of pairs)
+                Maps package names to selectors (str or SemSel).
+
+        Raises:
+            * ResolutionError
+                The requirements can not be satisfied.
+            See `SemSel.__init__` for exceptions raised for selector strings.
+
+        Returns:
+            * dict: Package names mapped to the chosen SemVer.
+        """
+        self._counts = [0] * len(_Stats._fields)
+        if isinstance(requirements, dict):
+            requirements = requirements.items()
+
+        constraints = {}
+        for package, sel in requirements:
+            constraints.setdefault(package, []).append((self._selector(sel), None))
+
+        assigned = {}
+        failure = []
+        if self._search(assigned, constraints, failure) is not None:
+            package, sel = failure[0]
+            raise ResolutionError(package, sel)
+        return assigned
+
+    # Private methods
+    def _selector(self, sel):
+        """Private. Do not touch.
+        """
+        return SemSel.compile(sel) if isinstance(sel, basestring) else SemSel._coerce(sel)
+
+    def _index(self, package):
+        """Private. Do not touch.
+
+        Return the VersionIndex of a package's versions.
+        """
+        index = self._indexes.get(package)
+        if index is None:
+            index = self._indexes[package] = VersionIndex(self.provider.versions(package))
+        return index
+
+    def _dependencies(self, package, ver):
+        """Private. Do not touch.
+
+        Return the dependencies of a package version as a sorted list of `(package, SemSel)`.
+        """
+        deps = self._deps.get((package, ver))
+        if deps is None:
+            deps = self.provider.dependencies(package, ver)
+            if isinstance(deps, dict):
+                deps = deps.items()
+            deps = self._deps[(package, ver)] = sorted((dep, self._selector(sel))
+                                                       for dep, sel in deps)
+        return deps
+
+    def _merge(self, cons):
+        """Private. Do not touch.
+
+        Return the intersection of the selectors of a package's constraints.
+        """
+        key = tuple(sel._source for sel, origin in cons)
+        merged = self._merged.get(key)
+        if merged is None:
+            sels = [sel for sel, origin in cons]
+            merged = self._merged[key] = sels[0].intersection(*sels[1:]) if key[1:] else sels[0]
+        return merged
+
+    def _candidates_for(self, package, cons):
+        """Private. Do not touch.
+
+        Return the versions of a package matching all its constraints, newest first.
+        """
+        merged = self._merge(cons)
+        key = (package, merged._source)
+        cands = self._candidates.get(key)
+        if cands is None:
+            self._counts[3] += 1
+            cands = self._candidates[key] = self._index(package).matching(merged)[::-1]
+        else:
+            self._counts[4] += 1
+        return cands
+
+    def _search(self, assigned, constraints, failure):
+        """Private. Do not touch.
+
+        Assign the open packages, one level of the search per package. `constraints` maps
+        packages to lists of `(SemSel, origin)` where origin is the package whose assigned version
+        imposed the selector (`None` for requirements). Both dicts are restored when returning a
+        failure.
+
+        Returns `None` on success and otherwise the conflict set: the packages whose assignments
+        together caused the failure. The failing package is recorded in `failure`.
+
+        The levels are kept on an explicit stack of frames instead of recursing, so the size of a
+        solution is not limited by the recursion limit. A frame is
+        `[package, constraints, candidate iterator, conflict set, dependencies pushed]`.
+        """
+        counts = self._counts
+        stack = []
+        culprits = None  # conflict set of the level that failed last, `None` to open a level
+        while True:
+            if culprits is None:
+                open_ = [p for p in constraints if p not in assigned]
+                if not open_:
+                    return None
+
+                # Fail first: the package with the fewest candidates, by name among equals
+                package = min(open_, key=lambda p: (len(self._candidates_for(p, constraints[p])),
+                                                    p))
+                cons = constraints[package]
+                failure[:] = [(package, self._merge(cons))]
+
+                # Other candidates might be allowed if the constraints' origins were assigned
+                # differently
+                conflict = set(origin for sel, origin in cons if origin is not None)
+                frame = [package, cons, iter(self._candidates_for(package, cons)), conflict, None]
+                stack.append(frame)
+            else:
+                # The level above the current frame failed, undo the frame's assignment
+                frame = stack[-1]
+                package, cons, cands, conflict, deps = frame
+                for dep, sel in reversed(deps):
+                    constraints[dep].pop()
+                    if not constraints[dep]:
+                        del constraints[dep]
+                del assigned[package]
+
+                if package not in culprits:
+                    # Choosing another version of this package can not help
+                    counts[2] += 1
+                    stack.pop()
+                    if not stack:
+                        return culprits
+                    continue
+                culprits.discard(package)
+                conflict |= culprits
+                counts[1] += 1
+
+            package, cons, cands, conflict = frame[:4]
+            culprits = None
+            for ver in cands:
+                counts[0] += 1
+                deps = self._dependencies(package, ver)
+
+                # Check the dependencies against assigned versions and remaining candidates first
+                for dep, sel in deps:
+                    dep_ver = ver if dep == package else assigned.get(dep)
+                    if dep_ver is not None:
+                        counts[3] += 1
+                        if not sel._contains(dep_ver._key):
+                            culprits = set([dep])
+                            break
+                    elif not self._candidates_for(dep,
+                                                  constraints.get(dep, []) + [(sel, package)]):
+                        culprits = set(origin for s, origin in constraints.get(dep, ())
+                                       if origin is not None)
+                        break
+
+                if culprits is None:
+                    assigned[package] = ver
+                    for dep, sel in deps:
+                        constraints.setdefault(dep, []).append((sel, package))
+                    frame[4] = deps
+                    break
+
+                conflict |= culprits
+                counts[1] += 1
+                culprits = None
+            else:
+                # All candidates failed
+                failure[:] = [(package, self._merge(cons))]
+                stack.pop()
+                if not stack:
+                    return conflict
+                culprits = conflict
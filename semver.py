@@ -29,6 +29,16 @@ Exported classes:
         Parses semantic version selector strings and defines methods for them.
     * SelParseError(Exception)
         An error among others raised when parsing a semantic version selector failed.
+    * VersionIndex(object)
+        Keeps versions sorted and answers selector queries by bisection.
+    * MappedVersionIndex(VersionIndex)
+        A read-only VersionIndex in a memory-mapped binary file.
+    * VersionArray(object)
+        Compact array-backed storage for large numbers of versions.
+    * SelectorIndex(object)
+        Finds all of many selectors that match a version.
+    * Instrumentation(object)
+        Opt-in call counters and timers for the parsing and matching hot paths.
 
 Other classes:
     * SemComparator(object)
@@ -38,6 +48,13 @@ Other classes:
 Functions/Variables/Constants:
     none
 
+Command line usage:
+    python -m semver [-s SEL] [--sort | --max | --min] [-u] [--valid-only] [--clean] [FILE ...]
+        Reads one version per line from the files or stdin and writes them normalized: only
+        those matching SEL, sorted, just the highest or lowest one, or without repetitions.
+        Exits with 1 if no version was written and with 2 on errors. `--sort` merges sorted
+        temporary files beyond `--memory-limit` versions.
+
 
 Copyright (c) 2013 Zachary King, FichteFoll
 
@@ -55,20 +72,250 @@ OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import mmap
 import re
+import struct
 import sys
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import namedtuple  # Python >=2.6
+from heapq import heappush, heapreplace
+from operator import itemgetter
+from threading import Lock
+from timeit import default_timer
 
 
-__all__ = ('SemVer', 'SemSel', 'SelParseError')
+__all__ = ('SemVer', 'SemSel', 'SelParseError', 'VersionIndex', 'MappedVersionIndex',
+           'VersionArray', 'SelectorIndex', 'Instrumentation')
 
 
 if sys.version_info[0] == 3:
     basestring = str
     cmp = lambda a, b: (a > b) - (a < b)
+else:
+    from itertools import izip as zip  # do not build lists of all rows
+
+
+# Version intervals
+#
+# Selectors are compiled to sorted lists of disjoint half-open intervals `(lo, hi)` over the keys
+# returned by `SemVer._key`. "0.0.0-" is the lowest version there is, so its key is the global
+# lower bound; the upper bound is a sentinel that compares greater than every version key.
+_MIN_KEY = (0, 0, 0, (0, ()), (0,))
+_MAX_KEY = (float('inf'),)
+
+# Packed release versions
+#
+# `SemVer.packed` is `major << 40 | minor << 20 | patch`, i.e. 23 bits major, 20 bits minor and
+# 20 bits patch. The result fits into a signed 64 bit integer (sqlite INTEGER, array('q'), ...)
+# and packed ints sort like the versions.
+_PACKED_SHIFT = 20
+_PACKED_MASK = (1 << _PACKED_SHIFT) - 1
+_PACKED_MAJOR = (1 << 23) - 1
+_PACKED_END = 1 << 63
+
+
+def _intersect(a, b):
+    """Private. Intersect two sorted lists of disjoint intervals.
+    """
+    ret, i, j = [], 0, 0
+    while i < len(a) and j < len(b):
+        lo, hi = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if lo < hi:
+            ret.append((lo, hi))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return ret
+
+
+def _union(intervals):
+    """Private. Merge any number of intervals into a sorted list of disjoint intervals.
+    """
+    ret = []
+    for lo, hi in sorted(intervals):
+        if not lo < hi:
+            continue
+        if ret and lo <= ret[-1][1]:
+            if hi > ret[-1][1]:
+                ret[-1] = (ret[-1][0], hi)
+        else:
+            ret.append((lo, hi))
+    return ret
+
+
+def _complement(intervals):
+    """Private. Complement a sorted list of disjoint intervals.
+    """
+    ret, prev = [], _MIN_KEY
+    for lo, hi in intervals:
+        if prev < lo:
+            ret.append((prev, lo))
+        prev = hi
+    if prev < _MAX_KEY:
+        ret.append((prev, _MAX_KEY))
+    return ret
+
+
+def _import_numpy(use_numpy=None):
+    """Private. Return the numpy module, or `None` if it is unavailable or not to be used.
+    """
+    if use_numpy is False:
+        return None
+    try:
+        import numpy
+    except ImportError:
+        if use_numpy:
+            raise
+        return None
+    return numpy
+
+
+# Selectors of the last `_match_chunk` call: (text, list of SemSel)
+_chunk_sels = (None, None)
+
+# Translates a bytearray of 0/1 flags into the digits of a binary number
+_FLAG_DIGITS = bytearray(256)
+_FLAG_DIGITS[0], _FLAG_DIGITS[1] = ord('0'), ord('1')
+_FLAG_DIGITS = bytes(_FLAG_DIGITS)
+
+
+def _match_chunk(task):
+    """Private. Match a chunk of versions against selectors, the worker of `SemSel.match_matrix`.
+
+    `task` is `(sels, vers)` with the selector and version strings each joined by newlines.
+    Returns a list with a bitset int of the matched versions for each selector.
+    """
+    global _chunk_sels
+    text, vers = task
+    sels = _chunk_sels[1] if _chunk_sels[0] == text else None
+    if sels is None:
+        sels = [SemSel(s) for s in text.split('\n')]
+        _chunk_sels = (text, sels)
+
+    vers = vers.split('\n')
+    keys = [v._key for v in SemVer.parse_many(vers)]
+    n = len(keys)
+    if n != len(vers):
+        raise ValueError("Version strings must not be empty")
+    if not n:
+        return [0] * len(sels)
+
+    # Match on the sorted keys, where every interval is a slice
+    order = sorted(range(n), key=keys.__getitem__)
+    keys = [keys[i] for i in order]
+    if order == list(range(n)):
+        gather = None
+    else:
+        rank = [0] * n
+        for j, i in enumerate(order):
+            rank[i] = j
+        gather = itemgetter(*rank)
+        ones = b'\x01' * n
+
+    ret = []
+    for sel in sels:
+        bits, flags = 0, bytearray(n) if gather else None
+        for lo, hi in zip(sel._lows, sel._highs):
+            a, b = bisect_left(keys, lo), bisect_left(keys, hi)
+            if a >= b:
+                continue
+            if gather:
+                flags[a:b] = ones[a:b]
+            else:
+                bits |= ((1 << b - a) - 1) << a
+        if gather:
+            # Back to the original order, the first version is the lowest bit
+            bits = int(bytes(bytearray(gather(flags))).translate(_FLAG_DIGITS)[::-1], 2)
+        ret.append(bits)
+    return ret
+
+
+def _match_chunks(task):
+    """Private. The worker of `SemSel.match_matrix`: Match several chunks of versions against the
+    same selectors.
+
+    `task` is `(sels, chunks)`, the selector strings joined by newlines and a list of chunks, the
+    version strings of each joined by newlines. Returns the results of `_match_chunk` as a list.
+    """
+    sels, chunks = task
+    return [_match_chunk((sels, vers)) for vers in chunks]
+
+
+_CacheInfo = namedtuple("CacheInfo", 'hits, misses, maxsize, currsize')
+_Stat = namedtuple("Stat", 'calls, seconds')
+
+
+class _LRUCache(object):
+    """Private. A thread-safe mapping of limited size that evicts the least recently used entry.
+
+    Entries are kept in a circular doubly linked list of `[prev, next, key, value]` links, the
+    most recently used one right before the root.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._lock = Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.misses = 0
+            self._map = {}
+            self._root = root = []
+            root[:] = [root, root, None, None]
+
+    def get(self, key):
+        """Return the value for `key` (marking it as recently used) or `None`.
+        """
+        with self._lock:
+            link = self._map.get(key)
+            if link is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+            prev, next_ = link[0], link[1]
+            prev[1], next_[0] = next_, prev
+            root = self._root
+            last = root[0]
+            last[1] = root[0] = link
+            link[0], link[1] = last, root
+            return link[3]
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._map:
+                return
+            root = self._root
+            if len(self._map) >= self.maxsize:
+                oldest = root[1]
+                root[1], oldest[1][0] = oldest[1], root
+                del self._map[oldest[2]]
+            last = root[0]
+            last[1] = root[0] = self._map[key] = [last, root, key, value]
+
+    def info(self):
+        return _CacheInfo(self.hits, self.misses, self.maxsize, len(self._map))
+
+
+class _cached_property(object):
+    """Private. A read-only property that is computed once and then stored on the instance.
+
+    The value is put into the instance's `__dict__` which shadows this (non-data) descriptor, so
+    later lookups are plain attribute accesses.
+    """
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.func.__name__] = self.func(obj)
+        return value
 
 
-# @functools.total_ordering would be nice here but was added in 2.7, __cmp__ is not Py3
 class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
     """Semantic Version, consists of 3 to 5 components defining the version's adicity.
 
@@ -77,6 +324,8 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
 
     Information on this particular class and their instances:
         - Immutable and hashable.
+        - Rich comparisons compare a sort key that is computed once per instance, see
+          `SemVer.sort_key()`.
         - Subclasses `collections.namedtuple`.
         - Always `True` in boolean context.
         - len() returns an int between 3 and 5; 4 when a pre-release is set and 5 when a build is
@@ -92,6 +341,12 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
             s[:3] == (1, 2, 3)
             s['build'] == '-4.5'
             s.major == 1
+        - The identifiers of pre-release and build are available pre-split as the attributes
+          `prerelease_parts` and `build_parts`.
+        - Release versions (without pre-release and build) can be packed into a single int, see
+          `SemVer.packed`.
+        - Pickles as its version string (or its components if the string does not parse back),
+          `SemVer.dumps()` serializes many versions at once.
 
     Short information on semantic version structure:
 
@@ -104,7 +359,8 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
 
     The pre-release component is indicated by a hyphen '-' and followed by alphanumeric[1] sequences
     separated by dots '.'. Sequences are compared numerically if applicable (both sequences of two
-    versions are numeric) or lexicographically. May also include hyphens. The existence of a
+    versions are numeric) or lexicographically, a numeric sequence is always lower than an
+    alphanumeric one. May also include hyphens. The existence of a
     pre-release component lowers the actual version; the shorter pre-release component is considered
     lower. An 'empty' pre-release component is considered to be the least version for this
     major-minor-patch combination (e.g. "1.0.0-").
@@ -120,14 +376,28 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
     """
 
     # Static class variables
-    _base_regex = r'''(?x)
+    _base_regex = r'''
         (?P<major>[0-9]+)
         \.(?P<minor>[0-9]+)
         \.(?P<patch>[0-9]+)
         (?:\-(?P<prerelease>(?:[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?))?
         (?:\+(?P<build>(?:[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?))?'''
-    _search_regex = re.compile(_base_regex)
-    _match_regex  = re.compile('^%s$' % _base_regex)  # required because of $ anchor
+    _search_regex = re.compile(_base_regex, re.X)
+    _search_bytes_regex = re.compile(_base_regex.encode('ascii'), re.X)  # for `finditer`
+    _match_regex  = re.compile('^%s$' % _base_regex, re.X)  # required because of $ anchor
+    _ident_regex  = re.compile(r'^[0-9A-Za-z.-]*$')
+
+    # Characters of the fast path scanner, see `SemVer._scan()`
+    _digits = '0123456789'
+    _ident_chars = _digits + 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ-.'
+    _version_chars = _ident_chars + '+'  # every character a version may consist of
+
+    # The intern cache, see `SemVer.enable_cache()`
+    _cache = None
+
+    # Identifiers of pre-releases and builds, see `SemVer._split_key()`
+    _idents = {}
+    _idents_max = 1 << 16
 
     # "Constructor"
     def __new__(cls, *args, **kwargs):
@@ -178,6 +448,18 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
             * ValueError
                 Invalid semantic version or option 2 parameters unconvertable.
         """
+        cache = cls._cache
+        if (cache is not None and not kwargs and 0 < len(args) < 3
+                and isinstance(args[0], basestring) and args[-1] is not None):
+            # Interned "SemVer(ver[, clean])", see `SemVer.enable_cache()`
+            key = (cls, args[0], len(args) == 2 and bool(args[1]))
+            self = cache.get(key)
+            if self is None:
+                ver = key[2] and cls.clean(args[0]) or args[0]
+                self = super(SemVer, cls).__new__(cls, *cls._parse(ver))
+                cache.put(key, self)
+            return self
+
         ver, clean, comps = None, False, None
         kw, l = kwargs.copy(), len(args) + len(kwargs)
 
@@ -219,7 +501,7 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
                         raise
                     else:
                         comps[i] = v
-                if t is basestring and not re.match(r"^[0-9A-Za-z.-]*$", v):
+                if t is basestring and not cls._ident_regex.match(v):
                     raise ValueError("Build and pre-release strings must match '^[0-9A-Za-z.-]*$'")
 
         # Final adjustments
@@ -246,28 +528,40 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
     def __len__(self):
         return 3 + (self.build is not None and 2 or self.prerelease is not None)
 
-    # Magic rich comparing methods
+    def __reduce__(self):
+        # Pickle the version string only, not the fields and cached attributes. Versions created
+        # from components the parser would reject pickle as their fields.
+        s = self._parsable_str()
+        return self.__class__, ((s,) if s is not None else tuple(self))
+
+    # Magic rich comparing methods, all of these compare the (cached) `_key` of both versions
     def __gt__(self, other):
-        return self._compare(other) == 1 if isinstance(other, SemVer) else NotImplemented
+        return self._key > other._key if isinstance(other, SemVer) else NotImplemented
 
     def __eq__(self, other):
-        return self._compare(other) == 0 if isinstance(other, SemVer) else NotImplemented
+        return self._key == other._key if isinstance(other, SemVer) else NotImplemented
 
     def __lt__(self, other):
-        return not (self > other or self == other)
+        return self._key < other._key if isinstance(other, SemVer) else NotImplemented
 
     def __ge__(self, other):
-        return not (self < other)
+        return self._key >= other._key if isinstance(other, SemVer) else NotImplemented
 
     def __le__(self, other):
-        return not (self > other)
+        return self._key <= other._key if isinstance(other, SemVer) else NotImplemented
 
     def __ne__(self, other):
-        return not (self == other)
+        return self._key != other._key if isinstance(other, SemVer) else NotImplemented
+
+    def __hash__(self):
+        # Must agree with __eq__, e.g. "1.0.0-01" == "1.0.0-1"
+        return hash(self._key)
 
     # Utility (class-)methods
     def satisfies(self, sel):
-        """Alias for `bool(sel.matches(self))` or `bool(SemSel(sel).matches(self))`.
+        """Alias for `bool(sel.matches(self))` or `bool(SemSel.compile(sel).matches(self))`.
+
+        Selector strings are looked up in the cache of `SemSel.compile()`.
 
         See `SemSel.__init__()` and `SemSel.matches(*vers)` for possible exceptions.
 
@@ -275,9 +569,106 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
             * bool: `True` if the version matches the passed selector, `False` otherwise.
         """
         if not isinstance(sel, SemSel):
-            sel = SemSel(sel)  # just "re-raise" exceptions
+            sel = SemSel.compile(sel)  # just "re-raise" exceptions
+
+        return sel._contains(self._key)
+
+    @classmethod
+    def sort_key(cls, ver):
+        """Return a tuple that compares like the version itself. Classmethod.
+
+        Comparing two keys is a single native tuple comparison, so this is the fastest way to sort
+        versions and also works on plain version strings:
+            sorted(["1.10.0", "1.9.0-rc.1", "1.9.0"], key=SemVer.sort_key)
+
+        Parameters:
+            * ver (str, SemVer)
+                A version string is parsed as a SemVer first.
+
+        Raises:
+            * TypeError
+                Invalid parameter type.
+            * ValueError
+                A string version could not be parsed as a SemVer.
+
+        Returns:
+            * tuple
+        """
+        if isinstance(ver, basestring):
+            ver = cls(ver)
+        elif not isinstance(ver, SemVer):
+            raise TypeError("Invalid parameter type '%s': %s" % (ver, type(ver)))
+        return ver._key
+
+    @classmethod
+    def dumps(cls, vers):
+        """Serialize versions to bytes in a compact form for storage or IPC. Classmethod.
+
+        The result is the newline-joined version strings, ASCII encoded; see `SemVer.loads()`.
+
+        Parameters:
+            * vers (iterable of str or SemVer)
+
+        Raises:
+            * TypeError
+                An item is not an instance of str (basestring) or SemVer.
+            * ValueError
+                A string version could not be parsed as a SemVer, or the string of a version
+                created from components does not parse back to it (e.g. "1.2.3-a..b").
 
-        return bool(sel.matches(self))
+        Returns:
+            * bytes
+        """
+        strs = []
+        for v in vers:
+            s = cls._coerce(v)._parsable_str()
+            if s is None:
+                raise ValueError("%r can not be serialized, its string is not a valid SemVer"
+                                 % (v,))
+            strs.append(s)
+        return '\n'.join(strs).encode('ascii')
+
+    @classmethod
+    def loads(cls, data):
+        """Deserialize the versions serialized by `SemVer.dumps()`. Classmethod.
+
+        Parameters:
+            * data (bytes, str)
+
+        Raises:
+            * ValueError
+                `data` contains an invalid version.
+
+        Returns:
+            * list of SemVer
+        """
+        if isinstance(data, bytes):
+            data = data.decode('ascii')
+        return list(cls.parse_many(data.split('\n')))
+
+    @classmethod
+    def from_packed(cls, packed):
+        """Create a release version from the int returned by `SemVer.packed`. Classmethod.
+
+        Parameters:
+            * packed (int)
+
+        Raises:
+            * TypeError
+                Invalid parameter type.
+            * ValueError
+                `packed` is negative or not below 2**63.
+
+        Returns:
+            * SemVer
+        """
+        if isinstance(packed, bool) or not isinstance(packed, (int, type(_PACKED_END))):
+            raise TypeError("%r is not an int" % packed)
+        if not 0 <= packed < _PACKED_END:
+            raise ValueError("%d is not a packed version" % packed)
+        return tuple.__new__(cls, (packed >> 2 * _PACKED_SHIFT,
+                                   packed >> _PACKED_SHIFT & _PACKED_MASK,
+                                   packed & _PACKED_MASK, None, None))
 
     @classmethod
     def valid(cls, ver):
@@ -326,7 +717,365 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
         else:
             return None
 
+    @classmethod
+    def enable_cache(cls, maxsize=4096):
+        """Intern parsed versions in a size-bounded LRU cache. Classmethod.
+
+        Once enabled, `SemVer(ver)` and `SemVer(ver, clean)` with a string return the very same
+        (immutable) instance for a string that has been parsed before, saving parse time and
+        memory when the same versions occur over and over. `SemVer.parse_many()` uses the cache as
+        well. The least recently used entry is evicted once `maxsize` versions are cached. Calling
+        this again replaces the cache.
+
+        Parameters:
+            * maxsize = `4096` (int; optional)
+                The maximum number of cached versions.
+
+        Raises:
+            * ValueError
+                `maxsize` is lower than 1.
+        """
+        if maxsize < 1:
+            raise ValueError("`maxsize` must be at least 1")
+        cls._cache = _LRUCache(maxsize)
+
+    @classmethod
+    def disable_cache(cls):
+        """Disable and drop the intern cache. Classmethod.
+        """
+        cls._cache = None
+
+    @classmethod
+    def cache_clear(cls):
+        """Remove all entries from the intern cache and reset its statistics. Classmethod.
+        """
+        if cls._cache is not None:
+            cls._cache.clear()
+
+    @classmethod
+    def cache_info(cls):
+        """Return statistics of the intern cache. Classmethod.
+
+        Returns:
+            * CacheInfo(hits, misses, maxsize, currsize) (namedtuple)
+                All zero if the cache is disabled.
+        """
+        if cls._cache is None:
+            return _CacheInfo(0, 0, 0, 0)
+        return cls._cache.info()
+
+    @classmethod
+    def parse_many(cls, vers, clean=False, errors='raise', failed=None):
+        """Parse many version strings lazily. Classmethod, generator.
+
+        Items are parsed directly and skip the argument handling of the constructor. Surrounding
+        whitespace is ignored and empty items are skipped, so this may be used on the lines of a
+        file as well (see `SemVer.parse_file()` for large files).
+
+        Parameters:
+            * vers (iterable of str)
+                The version strings.
+            * clean = `False` (bool; optional)
+                If this is true in boolean context, the first version found in each item is parsed
+                (see `SemVer.clean()`).
+            * errors = `'raise'` (str; optional)
+                What to do with an item that is not a valid version:
+                    'raise':   Raise a ValueError mentioning the (1-based) item number.
+                    'skip':    Ignore the item.
+                    'collect': Append a `(number, text)` tuple to the `failed` list.
+            * failed = `None` (list; optional)
+                Receives the error records when `errors` is 'collect'.
+
+        Raises:
+            * TypeError
+                An item is not a string.
+            * ValueError
+                Invalid `errors` parameter or missing `failed` list, or an item is not a valid
+                semantic version and `errors` is 'raise'.
+
+        Yields:
+            * SemVer
+        """
+        if errors not in ('raise', 'skip', 'collect'):
+            raise ValueError("Invalid value for `errors` parameter.")
+        if errors == 'collect' and failed is None:
+            raise ValueError("`failed` list is required when `errors` is 'collect'")
+
+        match = (cls._search_regex.search if clean else cls._match_regex.match)
+        scan = (None if clean else cls._scan)
+        new = tuple.__new__
+        cache, clean = cls._cache, bool(clean)
+
+        for i, ver in enumerate(vers, 1):
+            if not isinstance(ver, basestring):
+                raise TypeError("%r is not a string" % ver)
+            ver = ver.strip()
+            if not ver:
+                continue
+
+            if cache is not None:
+                obj = cache.get((cls, ver, clean))
+                if obj is not None:
+                    yield obj
+                    continue
+
+            g = scan and scan(ver)
+            if g is None:
+                m = match(ver)
+                if m is None:
+                    if errors == 'raise':
+                        raise ValueError("#%d: '%s' is not a valid SemVer string" % (i, ver))
+                    elif errors == 'collect':
+                        failed.append((i, ver))
+                    continue
+                g = m.groups()
+                g = (int(g[0]), int(g[1]), int(g[2]), g[3], g[4])
+
+            obj = new(cls, g)
+            if cache is not None:
+                cache.put((cls, ver, clean), obj)
+            yield obj
+
+    @classmethod
+    def parse_file(cls, f, clean=False, errors='raise', failed=None, chunksize=1 << 20):
+        """Parse a file with one version per line lazily. Classmethod, generator.
+
+        The file is read in chunks of `chunksize` characters and split into lines, each of which is
+        handled by `SemVer.parse_many()`. Item numbers in error records are line numbers.
+
+        Parameters:
+            * f (str, file)
+                A path or an open file object (text or binary). Paths are opened in binary mode,
+                binary input is decoded as latin-1 so that invalid bytes fail like invalid versions.
+            * chunksize = `1 << 20` (int; optional)
+                The number of characters (or bytes) read at once.
+            * clean, errors, failed
+                See `SemVer.parse_many()`.
+
+        Raises:
+            * IOError
+                The file could not be opened or read.
+            See `SemVer.parse_many()` for the remaining exceptions.
+
+        Yields:
+            * SemVer
+        """
+        if isinstance(f, basestring):
+            with open(f, 'rb') as fp:
+                for ver in cls.parse_file(fp, clean, errors, failed, chunksize):
+                    yield ver
+            return
+
+        for ver in cls.parse_many(cls._read_lines(f, chunksize), clean, errors, failed):
+            yield ver
+
+    @classmethod
+    def finditer(cls, source, chunksize=1 << 24):
+        """Find all versions in a text, like `SemVer.clean()` does for the first. Classmethod,
+        generator.
+
+        Files are memory-mapped if possible and searched at once, so even very large files are
+        scanned at about disk speed without being loaded. Other streams (pipes, `io.BytesIO`, text
+        mode files) are read in chunks of `chunksize`; a version that spans two chunks is found
+        as if the stream had been read at once.
+
+        Parameters:
+            * source (str, bytes, file, path)
+                The text to search: a str, bytes or bytearray, an open file object (read from its
+                current position) or a path object like `pathlib.Path`. Plain strings are searched
+                themselves and not taken as a file name.
+            * chunksize = `1 << 24` (int; optional)
+                The number of bytes (or characters) read at once from streams that can not be
+                memory-mapped.
+
+        Raises:
+            * TypeError
+                `source` is of none of the types above.
+            * IOError, OSError
+                The file could not be opened or read.
+
+        Yields:
+            * (int, SemVer)
+                The offset of each version and the version, in order. Offsets are counted in
+                bytes from where the search started, or in characters for str sources and text
+                mode files that can not be memory-mapped.
+        """
+        if isinstance(source, basestring):
+            for m in cls._search_regex.finditer(source):
+                yield m.start(), cls._from_match(m)
+            return
+        if isinstance(source, (bytes, bytearray)):
+            for m in cls._search_bytes_regex.finditer(source):
+                yield m.start(), cls._from_match(m)
+            return
+
+        fspath = getattr(source, '__fspath__', None)
+        if fspath is not None:
+            with open(fspath(), 'rb') as f:
+                for item in cls.finditer(f, chunksize):
+                    yield item
+            return
+        if not hasattr(source, 'read'):
+            raise TypeError("%r is neither a string, bytes, a file nor a path" % source)
+
+        # Map binary files, the regex searches the map directly
+        mm = None
+        if 'b' in getattr(source, 'mode', 'b'):
+            try:
+                start = source.tell()
+                mm = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, EnvironmentError, ValueError):
+                pass  # not a real file (e.g. a pipe or io.BytesIO) or empty
+        if mm is not None:
+            try:
+                for m in cls._search_bytes_regex.finditer(mm, start):
+                    yield m.start() - start, cls._from_match(m)
+            finally:
+                mm.close()
+            return
+
+        # Read chunks; a version can not contain a separator, so only the trailing run of version
+        # characters of a chunk may be part of one that continues in the next chunk
+        offset, rest = 0, None
+        while True:
+            chunk = source.read(chunksize)
+            buf = chunk if rest is None else rest + chunk
+            if isinstance(buf, basestring):
+                regex, chars = cls._search_regex, cls._version_chars
+            else:
+                regex, chars = cls._search_bytes_regex, cls._version_chars.encode('ascii')
+            cut = len(buf.rstrip(chars)) if chunk else len(buf)
+
+            for m in regex.finditer(buf, 0, cut):
+                yield offset + m.start(), cls._from_match(m)
+
+            if not chunk:
+                break
+            offset += cut
+            rest = buf[cut:]
+
+    # Read-only attributes
+    @_cached_property
+    def prerelease_parts(self):
+        """The identifiers of the pre-release as a tuple of ints (numeric identifiers) and strs,
+        e.g. `('alpha', 20240101, 1234)`, or `None` without pre-release. Computed once from the
+        sort key, recurring identifiers are shared between versions.
+        """
+        pre = self._key[3]
+        return tuple(x for t, x in pre[1]) if pre[0] == 0 else None
+
+    @_cached_property
+    def build_parts(self):
+        """The identifiers of the build like `SemVer.prerelease_parts`, or `None` without build.
+        """
+        build = self._key[4]
+        return tuple(x for t, x in build[1]) if build[0] == 1 else () if build[0] == 2 else None
+
+    @property
+    def packed(self):
+        """The release version as a single non-negative int below 2**63, or `None` for versions
+        with pre-release or build and for components that do not fit.
+
+        Bit layout (most significant first): 23 bits major, 20 bits minor, 20 bits patch. Packed
+        ints compare like the versions they were created from, see `SemVer.from_packed()` and
+        `SemSel.packed_ranges()`.
+        """
+        if self.prerelease is not None or self.build is not None:
+            return None
+        major, minor, patch = self[:3]
+        if not (0 <= major <= _PACKED_MAJOR and 0 <= minor <= _PACKED_MASK
+                and 0 <= patch <= _PACKED_MASK):
+            return None
+        return major << 2 * _PACKED_SHIFT | minor << _PACKED_SHIFT | patch
+
+    # Read-only (private) attributes
+    @_cached_property
+    def _key(self):
+        """Private. A tuple that sorts like the version, see `_make_key`. Computed once.
+        """
+        return self._make_key(*self)
+
     # Private (class-)methods
+    @classmethod
+    def _make_key(cls, major, minor, patch, prerelease, build):
+        """Private. Do not touch. Classmethod.
+
+        Build a comparison key from the components of a version:
+            (major, minor, patch, (0, idents) or (1,), (0,) or (1, idents) or (2,))
+
+        A missing pre-release (1,) sorts after every pre-release, a missing build (0,) before
+        every build and the empty build (2,) after every other build. Identifiers are `(0, int)`
+        when numeric and `(1, str)` otherwise.
+        """
+        return (major, minor, patch,
+                (1,) if prerelease is None else (0, cls._split_key(prerelease)),
+                (0,) if build is None else (1, cls._split_key(build)) if build else (2,))
+
+    @classmethod
+    def _split_key(cls, s):
+        """Private. Do not touch. Classmethod.
+
+        Split a pre-release or build into the identifiers of a key. Identifiers are looked up in
+        (and added to) `_idents` first, so recurring ones like "alpha" or "rc" are converted once
+        and shared by all keys.
+        """
+        if not s:
+            return ()
+        idents = cls._idents
+        if len(idents) > cls._idents_max:
+            idents.clear()
+        ret = []
+        for x in s.split('.'):
+            ident = idents.get(x)
+            if ident is None:
+                ident = idents[x] = (0, int(x)) if x.isdigit() else (1, x)
+            ret.append(ident)
+        return tuple(ret)
+
+    @staticmethod
+    def _key_succ(key):
+        """Private. Do not touch.
+
+        Return the key of the version that immediately follows the version with `key`. Every
+        version has one: appending a ".0" identifier to the build is the smallest step up; the
+        empty build is the highest variant and is followed by the next pre-release or patch.
+        """
+        major, minor, patch, pre, build = key
+        if build[0] == 0:
+            return (major, minor, patch, pre, (1, ((0, 0),)))
+        elif build[0] == 1:
+            return (major, minor, patch, pre, (1, build[1] + ((0, 0),)))
+        elif pre[0] == 0:
+            return (major, minor, patch, (0, pre[1] + ((0, 0),)), (0,))
+        else:
+            return (major, minor, patch + 1, (0, ()), (0,))
+
+    @staticmethod
+    def _key_pred(key):
+        """Private. Do not touch.
+
+        The reverse of the first two cases of `_key_succ`: Return the key of the version that
+        `key` immediately follows by an appended ".0" build identifier, or `None`.
+        """
+        build = key[4]
+        if build[0] != 1 or build[1][-1] != (0, 0):
+            return None
+        return key[:4] + ((1, build[1][:-1]) if len(build[1]) > 1 else (0,),)
+
+    @classmethod
+    def _from_key(cls, key):
+        """Private. Do not touch. Classmethod.
+
+        Create the version of a key. Leading zeros of numeric identifiers are not preserved.
+        """
+        def join(idents):
+            return '.'.join(str(x) for t, x in idents)
+
+        pre, build = key[3], key[4]
+        return tuple.__new__(cls, key[:3] + (join(pre[1]) if pre[0] == 0 else None,
+                                             '' if build[0] == 2 else
+                                             join(build[1]) if build[0] == 1 else None))
+
     @classmethod
     def _parse(cls, ver):
         """Private. Do not touch. Classmethod.
@@ -334,6 +1083,10 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
         if not isinstance(ver, basestring):
             raise TypeError("%r is not a string" % ver)
 
+        g = cls._scan(ver)
+        if g is not None:
+            return g
+
         match = cls._match_regex.match(ver)
 
         if match is None:
@@ -345,52 +1098,102 @@ class SemVer(namedtuple("_SemVer", 'major, minor, patch, prerelease, build')):
 
         return g  # Will be passed as namedtuple(...)(*g)
 
+    @classmethod
+    def _scan(cls, ver):
+        """Private. Do not touch. Classmethod.
+
+        Fast path of `_parse`: Split a version string with `str.partition` and `str.split`
+        instead of matching the regex. Returns the components like `_parse` or `None` if `ver`
+        is not a plain version, in which case the regex decides. Only strings the regex accepts
+        are accepted here (anything with a trailing newline, for example, is left to it).
+        """
+        core, plus, build = ver.partition('+')
+        core, minus, pre = core.partition('-')
+        try:
+            major, minor, patch = core.split('.')
+        except ValueError:
+            return None
+        # `str.isdigit()` would accept non-ASCII digits
+        if not (major and minor and patch) or (major + minor + patch).strip(cls._digits):
+            return None
+
+        chars = cls._ident_chars
+        if not minus:
+            pre = None
+        elif pre and (pre.strip(chars) or pre[0] == '.' or pre[-1] == '.' or '..' in pre):
+            return None
+        if not plus:
+            build = None
+        elif build and (build.strip(chars) or build[0] == '.' or build[-1] == '.'
+                        or '..' in build):
+            return None
+
+        return [int(major), int(minor), int(patch), pre, build]
+
+    @classmethod
+    def _from_match(cls, m):
+        """Private. Do not touch. Classmethod.
+
+        Create a version from a match of `_search_regex` or `_search_bytes_regex`.
+        """
+        g = m.groups()
+        pre, build = g[3], g[4]
+        if bytes is not str:  # Python 3, bytes have to be decoded
+            if isinstance(pre, bytes):
+                pre = pre.decode('ascii')
+            if isinstance(build, bytes):
+                build = build.decode('ascii')
+        return tuple.__new__(cls, (int(g[0]), int(g[1]), int(g[2]), pre, build))
+
+    @classmethod
+    def _coerce(cls, ver):
+        """Private. Do not touch. Classmethod.
+
+        Return `ver` as a SemVer, parsing it if it is a string.
+        """
+        if isinstance(ver, SemVer):
+            return ver
+        elif isinstance(ver, basestring):
+            return cls(ver)
+        raise TypeError("Invalid parameter type '%s': %s" % (ver, type(ver)))
+
+    @staticmethod
+    def _read_lines(f, chunksize):
+        """Private. Do not touch. Generator.
+
+        Read `f` in chunks and yield its lines, a line may span several chunks.
+        """
+        rest = ''
+        while True:
+            chunk = f.read(chunksize)
+            if not chunk:
+                break
+            if isinstance(chunk, bytes):
+                chunk = chunk.decode('latin-1')  # versions are ASCII, invalid ones fail later
+            lines = (rest + chunk).split('\n')
+            rest = lines.pop()
+            for line in lines:
+                yield line
+        if rest:
+            yield rest
+
     def _compare(self, other):
         """Private. Do not touch.
         self > other: 1
         self = other: 0
         self < other: -1
         """
-        # Shorthand lambdas
-        cp_len = lambda t, i=0: cmp(len(t[i]), len(t[not i]))
+        return cmp(self._key, other._key)
 
-        for i, (x1, x2) in enumerate(zip(self, other)):
-            if i > 2:
-                if x1 is None and x2 is None:
-                    continue
-
-                # self is greater when other has a prerelease but self doesn't
-                # self is less    when other has a build      but self doesn't
-                if x1 is None or x2 is None:
-                    return int(2 * (i - 3.5)) * (1 - 2 * (x1 is None))
-
-                # self is less when other's build is empty
-                if i == 4 and (not x1 or not x2) and x1 != x2:
-                    return 1 - 2 * bool(x1)
-
-                # Split by '.' and use numeric comp or lexicographical order
-                t2 = [x1.split('.'), x2.split('.')]
-                for y1, y2 in zip(*t2):
-                    if y1.isdigit() and y2.isdigit():
-                        y1 = int(y1)
-                        y2 = int(y2)
-                    if y1 > y2:
-                        return 1
-                    elif y1 < y2:
-                        return -1
-
-                # The "longer" sub-version is greater
-                d = cp_len(t2)
-                if d:
-                    return d
-            else:
-                if x1 > x2:
-                    return 1
-                elif x1 < x2:
-                    return -1
+    def _parsable_str(self):
+        """Private. Do not touch.
 
-        # The versions equal
-        return 0
+        Return `str(self)` if it parses back to this version, `None` otherwise. Versions created
+        from components may not, e.g. `SemVer(-1, 0, 0)` or `SemVer(1, 2, 3, build='.x')`.
+        """
+        s = str(self)
+        m = self._match_regex.match(s)
+        return s if m and m.end() == len(s) else None  # `$` also matches before a trailing '\n'
 
 
 class SemComparator(object):
@@ -480,6 +1283,30 @@ class SemComparator(object):
             raise TypeError("Unable to compare %r with operator '%s'" % (ver, self.op))
         return ret
 
+    # Private methods
+    def _intervals(self):
+        """Private. Do not touch.
+
+        Return the sorted list of half-open key intervals matched by this comparator.
+        """
+        op, key = self.op, self.ver._key
+        if op in self._ops_satisfy:
+            ivs = [(key[:3] + _MIN_KEY[3:], (key[0], key[1], key[2] + 1) + _MIN_KEY[3:])]
+        elif op in ('=', '!='):
+            ivs = [(key, SemVer._key_succ(key))]
+        elif op == '>=':
+            ivs = [(key, _MAX_KEY)]
+        elif op == '>':
+            ivs = [(SemVer._key_succ(key), _MAX_KEY)]
+        elif op == '<':
+            ivs = [(_MIN_KEY, key)]
+        else:  # '<='
+            ivs = [(_MIN_KEY, SemVer._key_succ(key))]
+
+        if op in ('!', '!='):
+            return _complement(ivs)
+        return _union(ivs)
+
 
 class SemSelAndChunk(list):
     """Extends list and defines a few methods used for matching versions.
@@ -528,6 +1355,17 @@ class SemSelAndChunk(list):
         """
         self.append(SemComparator(op, SemVer(ver)))
 
+    # Private methods
+    def _intervals(self):
+        """Private. Do not touch.
+
+        Return the intersection of the intervals of all children.
+        """
+        ret = [(_MIN_KEY, _MAX_KEY)]
+        for cp in self:
+            ret = _intersect(ret, cp._intervals())
+        return ret
+
 
 class SemSelOrChunk(list):
     """Extends list and defines a few methods used for matching versions.
@@ -573,6 +1411,14 @@ class SemSelOrChunk(list):
         self.append(ch)
         return ch
 
+    # Private methods
+    def _intervals(self):
+        """Private. Do not touch.
+
+        Return the union of the intervals of all children.
+        """
+        return _union(iv for ch in self for iv in ch._intervals())
+
 
 class SelParseError(Exception):
     """An Exception raised when parsing a semantic selector failed.
@@ -590,6 +1436,10 @@ class SemSel(tuple):
         - Always `True` in boolean context.
         - len() returns the number of containing *and chunks* (see below).
         - Iterable, iterates over containing *and chunks*.
+        - Compiled into a sorted union of version intervals on construction, matching a version is
+          a binary search over these. Changes made to the chunks afterwards are not picked up.
+        - Pickles as the selector string it was created from, which is compiled again when
+          unpickling.
 
     When talking about "versions" it refers to a semantic version (SemVer). For information on how
     versions compare to one another, see SemVer's doc string.
@@ -617,7 +1467,16 @@ class SemSel(tuple):
         ~1 || 0.0.3 || <0.0.2 >0.0.1+b.1337 || 2.0.x || 2.1.0 - 2.1.0+b.12 !=2.1.0+b.9
 
     Methods:
-        * matches(*vers)
+        * matches(*vers), iter_matches(vers)
+        * max_satisfying(vers), min_satisfying(vers), top_k(vers, k)
+        * mask(vers, use_numpy=None)
+        * specialize()
+        * simplify()
+        * packed_ranges()
+        * intersection(*others), union(*others), complement()
+        * is_empty(), issubset(other), overlaps(other)
+        * compile(sel) (classmethod)
+        * match_matrix(sels, vers, chunksize=8192, executor=None, max_workers=None) (classmethod)
     """
     # Private properties
     _fuzzy_regex = re.compile(r'''(?x)^
@@ -639,6 +1498,9 @@ class SemSel(tuple):
         (?P<other>.*)$''')
     _split_op_regex = re.compile(r'^(?P<op>=|[<>!]=?)?(?P<ver>.*)$')
 
+    # Compiled selectors by their text, see `SemSel.compile()`
+    _compile_cache = _LRUCache(1024)
+
     # "Constructor"
     def __new__(cls, sel):
         """Constructor examples:
@@ -659,7 +1521,10 @@ class SemSel(tuple):
                 explicit range) or invalid '||'
         """
         chunk = cls._parse(sel)
-        return super(SemSel, cls).__new__(cls, (chunk,))
+        self = super(SemSel, cls).__new__(cls, (chunk,))
+        self._source = sel
+        self._compile()
+        return self
 
     # Magic methods
     def __str__(self):
@@ -675,45 +1540,588 @@ class SemSel(tuple):
     def __iter__(self):
         return iter(self._chunk)
 
-    # Read-only (private) attributes
-    @property
-    def _chunk(self):
-        return self[0]
+    def __reduce__(self):
+        # Pickle the selector string only, not the chunks and compiled intervals. `str(self)` is
+        # not parsed the same in every case ("1.0.0" becomes "~1.0.0"), so use the source.
+        return self.__class__, (self._source,)
 
-    # Utility methods
-    def matches(self, *vers):
-        """Match the selector against a selection of versions.
+    # Cache (class-)methods
+    @classmethod
+    def compile(cls, sel):
+        """Return a selector for the string `sel`, reusing a previously created one. Classmethod.
+
+        The selectors are kept in a cache of the 1024 most recently used selector strings, so
+        recurring selectors are only parsed once. As selectors are shared this way, their chunks
+        must not be modified.
 
         Parameters:
-            * *vers (str, SemVer)
-                Versions can be passed as strings and SemVer objects will be created with them.
-                May also be a mixed list.
+            * sel (str)
+                A version selector string.
 
         Raises:
-            * TypeError
-                A version is not an instance of str (basestring) or SemVer.
-            * ValueError
-                A string version could not be parsed as a SemVer.
+            See `SemSel.__init__`.
 
         Returns:
-            * list
-                A list with all the versions that matched, may be empty. Use `max()` to determine
-                the highest matching version, or `min()` for the lowest.
+            * SemSel
         """
-        ret = []
-        for v in vers:
-            if isinstance(v, str):
-                t = self._chunk.matches(SemVer(v))
-            elif isinstance(v, SemVer):
-                t = self._chunk.matches(v)
-            else:
-                raise TypeError("Invalid parameter type '%s': %s" % (v, type(v)))
-            if t:
-                ret.append(v)
-
-        return ret
+        cache = cls._compile_cache
+        key = (cls, sel)
+        self = cache.get(key) if isinstance(sel, basestring) else None
+        if self is None:
+            self = cls(sel)
+            cache.put(key, self)
+        return self
+
+    @classmethod
+    def cache_clear(cls):
+        """Remove all selectors cached by `SemSel.compile()` and reset its statistics. Classmethod.
+        """
+        cls._compile_cache.clear()
+
+    @classmethod
+    def cache_info(cls):
+        """Return statistics of the `SemSel.compile()` cache. Classmethod.
+
+        Returns:
+            * CacheInfo(hits, misses, maxsize, currsize) (namedtuple)
+        """
+        return cls._compile_cache.info()
+
+    # Batch (class-)methods
+    @classmethod
+    def match_matrix(cls, sels, vers, chunksize=8192, executor=None, max_workers=None):
+        """Match many selectors against many versions in parallel. Classmethod.
+
+        The versions are split into chunks of `chunksize` versions that are matched against all
+        selectors by the workers of an executor. Versions and selectors are sent to the workers as
+        newline-joined strings, so arbitrary large inputs are not pickled object by object. Every
+        worker gets a single task with an equal share of the chunks, so the selectors are sent
+        (and compiled) only once per worker.
+
+        Without `executor` a `concurrent.futures.ProcessPoolExecutor` is used for the duration of
+        the call, or a `ThreadPoolExecutor` on Python builds without the GIL. A single chunk (or a
+        Python without `concurrent.futures`) is matched in the calling thread.
+
+        Parameters:
+            * sels (iterable of str, SemSel)
+            * vers (iterable of str, SemVer)
+            * chunksize = `8192` (int; optional)
+                The number of versions per task. Rounded up to a multiple of 8.
+            * executor = `None` (concurrent.futures.Executor; optional)
+                An executor to submit the tasks to. It is not shut down.
+            * max_workers = `None` (int; optional)
+                Passed to the executor created when `executor` is `None`.
+
+        Raises:
+            * ValueError
+                Invalid chunk size or a version string is not a valid semantic version.
+            See `SemSel.__init__` for exceptions raised for selector strings.
+
+        Returns:
+            * list of int
+                A bitset for each selector in which bit `i` (i.e. `bits >> i & 1`) is set if the
+                selector matches `vers[i]`.
+        """
+        # Selectors are sent as their source, on one line each. `str(sel)` is not parsed the same
+        # in every case ("1.0.0" becomes "~1.0.0").
+        sels = [' '.join(cls._coerce(s)._source.split()) for s in sels]
+        # Version strings are parsed by the workers, except those containing a newline: `SemVer()`
+        # accepts a trailing one ('$' matches before it), which would split the joined chunk
+        vers = [v if isinstance(v, basestring) and '\n' not in v else str(SemVer._coerce(v))
+                for v in vers]
+        if chunksize < 1:
+            raise ValueError("chunksize must be positive")
+        chunksize = (chunksize + 7) // 8 * 8
+        if not sels:
+            return []
+
+        text = '\n'.join(sels)
+        chunks = ['\n'.join(vers[i:i + chunksize]) for i in range(0, len(vers), chunksize)]
+
+        pool = None
+        if executor is None and len(chunks) > 1:
+            try:
+                import concurrent.futures as futures
+            except ImportError:
+                pass
+            else:
+                if getattr(sys, '_is_gil_enabled', lambda: True)():
+                    executor = pool = futures.ProcessPoolExecutor(max_workers)
+                else:
+                    executor = pool = futures.ThreadPoolExecutor(max_workers)
+        # One task per worker; the number of workers of an executor is not public
+        workers = 1
+        if executor:
+            workers = getattr(executor, '_max_workers', None)
+            if not workers:
+                from multiprocessing import cpu_count
+                workers = cpu_count()
+        per_task = -(-len(chunks) // workers) or 1
+        tasks = [(text, chunks[i:i + per_task]) for i in range(0, len(chunks), per_task)]
+        run = executor.map if executor else map
+        try:
+            results = [res for part in run(_match_chunks, tasks) for res in part]
+        finally:
+            if pool:
+                pool.shutdown()
+
+        # Chunk bitsets are concatenated as hex digits, shifting big ints is much slower
+        width = chunksize // 4
+        return [int(''.join('%0*x' % (width, res[i]) for res in reversed(results)) or '0', 16)
+                for i in range(len(sels))]
+
+    # Read-only (private) attributes
+    @property
+    def _chunk(self):
+        return self[0]
+
+    # Utility methods
+    def matches(self, *vers):
+        """Match the selector against a selection of versions.
+
+        Parameters:
+            * *vers (str, SemVer)
+                Versions can be passed as strings and SemVer objects will be created with them.
+                May also be a mixed list. A single other argument is taken as an iterable of
+                versions, e.g. a list or a generator.
+
+        Raises:
+            * TypeError
+                A version is not an instance of str (basestring) or SemVer.
+            * ValueError
+                A string version could not be parsed as a SemVer.
+
+        Returns:
+            * list
+                A list with all the versions that matched, may be empty. Use `max()` to determine
+                the highest matching version, or `min()` for the lowest.
+        """
+        if len(vers) == 1 and not isinstance(vers[0], (basestring, SemVer)):
+            vers = vers[0]
+        return list(self.iter_matches(vers))
+
+    def iter_matches(self, vers):
+        """Match the selector against an iterable of versions lazily. Generator.
+
+        Versions are taken from `vers` and parsed one at a time, so the caller may stop early
+        without consuming (or parsing) the rest.
+
+        Parameters:
+            * vers (iterable of str or SemVer)
+
+        Raises:
+            See `SemSel.matches()`, raised when the offending version is reached.
+
+        Yields:
+            * str or SemVer
+                The matching items of `vers` as they were passed, in order.
+        """
+        contains = self._contains
+        coerce = SemVer._coerce
+        for v in vers:
+            if contains(coerce(v)._key):
+                yield v
+
+    def max_satisfying(self, vers):
+        """Return the highest version of an iterable that matches the selector.
+
+        The iterable is consumed once and only the running best is kept, so `vers` may be a
+        generator of any length. Versions that do not exceed the running best are not matched.
+
+        Parameters:
+            * vers (iterable of str or SemVer)
+
+        Raises:
+            See `SemSel.matches()`.
+
+        Returns:
+            * str or SemVer
+                The highest matching item of `vers` as it was passed (the first one among equal
+                versions), or `None` if no version matched.
+        """
+        contains = self._contains
+        coerce = SemVer._coerce
+        best = best_key = None
+        for v in vers:
+            key = coerce(v)._key
+            if (best_key is None or key > best_key) and contains(key):
+                best, best_key = v, key
+        return best
+
+    def min_satisfying(self, vers):
+        """Return the lowest version of an iterable that matches the selector.
+
+        The counterpart of `SemSel.max_satisfying()`; same parameters and exceptions.
+
+        Returns:
+            * str or SemVer
+                The lowest matching item of `vers` as it was passed (the first one among equal
+                versions), or `None` if no version matched.
+        """
+        contains = self._contains
+        coerce = SemVer._coerce
+        best = best_key = None
+        for v in vers:
+            key = coerce(v)._key
+            if (best_key is None or key < best_key) and contains(key):
+                best, best_key = v, key
+        return best
+
+    def top_k(self, vers, k):
+        """Return the `k` highest versions of an iterable that match the selector.
+
+        The iterable is consumed once while a heap of the `k` best matches so far is kept, so
+        memory stays proportional to `k`. Once the heap is full, versions that do not exceed its
+        lowest entry are not matched.
+
+        Parameters:
+            * vers (iterable of str or SemVer)
+            * k (int)
+                The maximum number of versions to return.
+
+        Raises:
+            See `SemSel.matches()`.
+
+        Returns:
+            * list
+                Up to `k` matching items of `vers` as they were passed, highest first. Equal
+                versions are kept in the order they were passed.
+        """
+        if k <= 0:
+            return []
+        contains = self._contains
+        coerce = SemVer._coerce
+        heap = []  # (key, -position, item); heap[0] is the lowest kept match
+        for i, v in enumerate(vers):
+            key = coerce(v)._key
+            if len(heap) < k:
+                if contains(key):
+                    heappush(heap, (key, -i, v))
+            elif key > heap[0][0] and contains(key):
+                heapreplace(heap, (key, -i, v))
+        heap.sort(reverse=True)
+        return [v for key, i, v in heap]
+
+    def mask(self, vers, use_numpy=None):
+        """Match the selector against a batch of versions and return a boolean mask.
+
+        With NumPy, the numeric components of all versions are compared against the bounds of the
+        compiled intervals at once; only versions whose major, minor and patch equal those of a
+        bound are matched one by one, because pre-release and build decide there. Without NumPy,
+        the versions are matched in a plain loop. The result is the same as for
+        `SemSel.matches()`.
+
+        Parameters:
+            * vers (VersionArray, iterable of str or SemVer)
+            * use_numpy = `None` (bool; optional)
+                `None` uses NumPy if it can be imported, `True` requires it and `False` never
+                uses it.
+
+        Raises:
+            * ImportError
+                `use_numpy` is `True` but NumPy is not available.
+            * TypeError
+                A version is not an instance of str (basestring) or SemVer.
+            * ValueError
+                A string version could not be parsed as a SemVer.
+
+        Returns:
+            * numpy.ndarray (dtype bool) when using NumPy, `list` of bool otherwise
+                One item for every version, in order.
+        """
+        np = _import_numpy(use_numpy)
+
+        if np is None:
+            if isinstance(vers, VersionArray):
+                return [self._contains(k) for k in vers._row_keys()]
+            return [self._contains(SemVer._coerce(v)._key) for v in vers]
+
+        if not isinstance(vers, VersionArray):
+            arr = VersionArray()
+            for v in vers:
+                arr.append(v)
+            vers = arr
+
+        major, minor, patch = (np.asarray(col) for col in vers._cols[:3])
+
+        def gt(t):
+            return (major > t[0]) | (major == t[0]) & ((minor > t[1])
+                                                       | (minor == t[1]) & (patch > t[2]))
+
+        def eq(t):
+            return (major == t[0]) & (minor == t[1]) & (patch == t[2])
+
+        ret = np.zeros(len(vers), dtype=bool)
+        ties = np.zeros(len(vers), dtype=bool)
+        for lo, hi in zip(self._lows, self._highs):
+            inside = gt(lo)
+            ties |= eq(lo)
+            if hi is not _MAX_KEY:
+                inside &= ~(gt(hi) | eq(hi))
+                ties |= eq(hi)
+            ret |= inside
+
+        for i in np.flatnonzero(ties):
+            ret[i] = self._contains(vers[int(i)]._key)
+        return ret
+
+    def specialize(self):
+        """Generate a matching function for this selector's intervals and use it from now on.
+
+        The generated code has the interval bounds inlined as constants and decides between them
+        with nested ifs (a binary search written out as code) and chained comparisons. As these
+        compare the sort keys of versions, the numeric components are compared first and
+        pre-release and build only if they are equal. This is worthwhile for selectors that are
+        matched very often, e.g. those returned by `SemSel.compile()`; it is idempotent.
+
+        Returns:
+            * SemSel: self
+        """
+        if '_contains' not in self.__dict__:
+            self._contains = self._generate()
+        return self
+
+    def simplify(self):
+        """Return an equivalent selector in canonical form.
+
+        Redundant comparators are collapsed, and chunks that can never match or that are covered
+        by other chunks are dropped. The result has one and chunk per disjoint version range,
+        sorted in ascending order, with at most one lower and one upper bound each (or a single
+        "=" comparator). Equivalent selectors result in the same string representation.
+        A selector that matches nothing is represented as "<0.0.0-".
+
+        Example:
+            >>> SemSel(">=1.0.0 >=1.2.0 <3.0.0 <2.5.0 || 1.3.x || >2.0.0 <1.0.0").simplify()
+            SemSel(">=1.2.0 <2.5.0")
+
+        Returns:
+            * SemSel
+        """
+        return self._from_intervals(self._ivs)
+
+    def intersection(self, *others):
+        """Return a selector that matches the versions matched by this and all other selectors.
+
+        This and the other set operations are computed on the compiled version ranges, i.e. in
+        O(number of comparators) and without testing any versions. Their results are in canonical
+        form (see `simplify()`).
+
+        Parameters:
+            * *others (str, SemSel)
+
+        Raises:
+            See `SemSel.__init__` for exceptions raised when a selector is a string.
+
+        Returns:
+            * SemSel
+        """
+        ivs = self._ivs
+        for sel in others:
+            ivs = _intersect(ivs, self._coerce(sel)._ivs)
+        return self._from_intervals(ivs)
+
+    def union(self, *others):
+        """Return a selector that matches the versions matched by this or any other selector.
+
+        Parameters:
+            * *others (str, SemSel)
+
+        Raises:
+            See `SemSel.__init__` for exceptions raised when a selector is a string.
+
+        Returns:
+            * SemSel
+        """
+        return self._from_intervals(_union(self._ivs + [iv for sel in others
+                                                         for iv in self._coerce(sel)._ivs]))
+
+    def complement(self):
+        """Return a selector that matches exactly the versions this selector does not match.
+
+        Returns:
+            * SemSel
+        """
+        return self._from_intervals(_complement(self._ivs))
+
+    def is_empty(self):
+        """Check whether the selector can not match any version, e.g. ">2.0.0 <1.0.0".
+
+        Returns:
+            * bool
+        """
+        return not self._lows
+
+    def issubset(self, other):
+        """Check whether every version matched by this selector is matched by `other` as well.
+
+        Parameters:
+            * other (str, SemSel)
+
+        Raises:
+            See `SemSel.__init__` for exceptions raised when `other` is a string.
+
+        Returns:
+            * bool
+        """
+        return _intersect(self._ivs, self._coerce(other)._ivs) == self._ivs
+
+    def overlaps(self, other):
+        """Check whether there is a version that is matched by both selectors.
+
+        Parameters:
+            * other (str, SemSel)
+
+        Raises:
+            See `SemSel.__init__` for exceptions raised when `other` is a string.
+
+        Returns:
+            * bool
+        """
+        return bool(_intersect(self._ivs, self._coerce(other)._ivs))
+
+    def packed_ranges(self):
+        """Return the release versions matched by the selector as ranges of packed ints.
+
+        A release version `v` is matched if and only if `lo <= v.packed < hi` for one of the
+        ranges, so selectors can be turned into integer range predicates (e.g. SQL) over a column
+        of `SemVer.packed` values. Pre-releases and builds are not covered.
+
+        Returns:
+            * list of (lo, hi) int tuples
+                Sorted, disjoint and not adjacent; empty if no release version is matched.
+        """
+        ret = []
+        for lo, hi in self._ivs:
+            lo, hi = self._packed_ceil(lo), self._packed_ceil(hi)
+            if lo >= hi:
+                continue
+            if ret and ret[-1][1] == lo:
+                ret[-1] = (ret[-1][0], hi)
+            else:
+                ret.append((lo, hi))
+        return ret
+
+    # Read-only (private) attributes
+    @property
+    def _ivs(self):
+        """Private. The compiled intervals as a list of `(lo, hi)` tuples.
+        """
+        return list(zip(self._lows, self._highs))
+
+    # Private methods
+    @staticmethod
+    def _packed_ceil(key):
+        """Private. Do not touch.
+
+        Return the packed int of the lowest packable release version whose key is not lower than
+        `key`, or 2**63 if there is none.
+        """
+        if key == _MAX_KEY:
+            return _PACKED_END
+        major, minor, patch = key[:3]
+        if (major, minor, patch, (1,), (0,)) < key:
+            patch += 1
+        if patch > _PACKED_MASK:
+            minor, patch = minor + 1, 0
+        if minor > _PACKED_MASK:
+            major, minor, patch = major + 1, 0, 0
+        if major > _PACKED_MAJOR:
+            return _PACKED_END
+        return major << 2 * _PACKED_SHIFT | minor << _PACKED_SHIFT | patch
+
+    @classmethod
+    def _coerce(cls, sel):
+        """Private. Do not touch. Classmethod.
+
+        Return `sel` as a SemSel, compiling it if it is a string.
+        """
+        return sel if isinstance(sel, SemSel) else cls.compile(sel)
+
+    @classmethod
+    def _from_intervals(cls, ivs):
+        """Private. Do not touch. Classmethod.
+
+        Create a selector in canonical form (see `simplify()`) from a sorted list of disjoint
+        intervals.
+        """
+        or_chunk = SemSelOrChunk()
+        for lo, hi in ivs or [(_MIN_KEY, _MIN_KEY)]:
+            and_chunk = or_chunk.new_child()
+            if lo == _MIN_KEY and hi in (_MIN_KEY, _MAX_KEY):
+                and_chunk.append(SemComparator('<' if hi == _MIN_KEY else '>=',
+                                               SemVer._from_key(_MIN_KEY)))
+                continue
+            elif hi == SemVer._key_succ(lo):
+                and_chunk.append(SemComparator('=', SemVer._from_key(lo)))
+                continue
+
+            if lo != _MIN_KEY:
+                pred = SemVer._key_pred(lo)
+                and_chunk.append(SemComparator('>=', SemVer._from_key(lo)) if pred is None
+                                 else SemComparator('>', SemVer._from_key(pred)))
+            if hi != _MAX_KEY:
+                pred = SemVer._key_pred(hi)
+                and_chunk.append(SemComparator('<', SemVer._from_key(hi)) if pred is None
+                                 else SemComparator('<=', SemVer._from_key(pred)))
+
+        self = tuple.__new__(cls, (or_chunk,))
+        self._source = str(or_chunk)
+        self._lows = [lo for lo, hi in ivs]
+        self._highs = [hi for lo, hi in ivs]
+        return self
+
+    def _compile(self):
+        """Private. Do not touch.
+
+        Compile the parsed chunks into a sorted union of disjoint half-open key intervals so that
+        matching a version is a binary search instead of evaluating every comparator. The
+        interval bounds are kept in two parallel lists, `_lows` and `_highs`.
+        """
+        ivs = self._chunk._intervals()
+        self._lows = [lo for lo, hi in ivs]
+        self._highs = [hi for lo, hi in ivs]
+
+    def _contains(self, key):
+        """Private. Do not touch.
+
+        Check whether a version key lies within one of the compiled intervals.
+        """
+        i = bisect_right(self._lows, key)
+        return i > 0 and key < self._highs[i - 1]
+
+    def _generate(self):
+        """Private. Do not touch.
+
+        Generate and compile the code of a specialized `_contains(key)` function, see
+        `specialize()`. The bounds are passed as default arguments, which are the fastest lookups.
+        """
+        ivs, consts = self._ivs, []
+
+        def const(key):
+            consts.append(key)
+            return '_k%d' % (len(consts) - 1)
+
+        def gen(i, j, indent):
+            # Code for the intervals i to j (exclusive)
+            if j - i <= 3:
+                conds = []
+                for lo, hi in ivs[i:j]:
+                    cond = ((const(lo) + ' <= ' if lo != _MIN_KEY else '') + 'key'
+                            + (' < ' + const(hi) if hi != _MAX_KEY else ''))
+                    conds.append(cond if cond != 'key' else 'True')
+                return [indent + 'return ' + (' or '.join(conds) or 'False')]
+            mid = (i + j) // 2
+            return ([indent + 'if key < %s:' % const(ivs[mid][0])]
+                    + gen(i, mid, indent + '    ')
+                    + gen(mid, j, indent))
+
+        body = gen(0, len(ivs), '    ')
+        ns = dict(('_k%d' % i, key) for i, key in enumerate(consts))
+        src = ('def _contains(key%s):\n' % ''.join(', %s=%s' % (n, n) for n in sorted(ns))
+               + '\n'.join(body) + '\n')
+        exec(compile(src, '<SemSel("%s")>' % self, 'exec'), ns)
+        return ns['_contains']
 
-    # Private methods
     @classmethod
     def _parse(cls, sel):
         """Private. Do not touch.
@@ -831,3 +2239,1068 @@ class SemSel(tuple):
 
         # Finally return the or_chunk
         return or_chunk
+
+
+class VersionIndex(object):
+    """A sorted collection of versions that answers selector queries by bisection.
+
+    Constructor: VersionIndex(["1.0.0", SemVer("1.2.0"), "2.0.0-rc.1"])
+
+    The versions are kept sorted (duplicates are kept as well) and every selector is only evaluated
+    through the bounds of its compiled version intervals, so a query costs O(log n) per interval
+    plus the size of the result instead of testing every version. Results equal those of
+    `SemSel.matches` but are returned in ascending order.
+
+    Methods:
+        * add(ver)
+        * index(ver)
+        * bisect_left(ver), bisect_right(ver)
+        * matching(sel)
+        * max_satisfying(sel)
+        * min_satisfying(sel)
+        * count(sel)
+    """
+    # Constructor
+    def __init__(self, vers=()):
+        """Constructor examples:
+            VersionIndex()
+            VersionIndex(["1.0.0", "1.0.1"])
+            VersionIndex(SemVer(v) for v in lines)
+
+        Parameters:
+            * vers = `()` (iterable of str or SemVer; optional)
+                The versions to index. Strings are parsed as SemVer objects.
+
+        Raises:
+            * TypeError
+                A version is not an instance of str (basestring) or SemVer.
+            * ValueError
+                A string version could not be parsed as a SemVer.
+        """
+        super(VersionIndex, self).__init__()
+
+        pairs = sorted(((v._key, v) for v in map(SemVer._coerce, vers)), key=lambda p: p[0])
+        self._keys = [k for k, v in pairs]
+        self._vers = [v for k, v in pairs]
+
+    # Magic methods
+    def __len__(self):
+        return len(self._vers)
+
+    def __iter__(self):
+        return iter(self._vers)
+
+    def __repr__(self):
+        return 'VersionIndex(%r)' % self._vers
+
+    def __contains__(self, ver):
+        try:
+            self.index(ver)
+        except ValueError:
+            return False
+        return True
+
+    # Utility methods
+    def add(self, ver):
+        """Add a version to the index, keeping it sorted.
+
+        Parameters:
+            * ver (str, SemVer)
+
+        Raises:
+            See `VersionIndex.__init__`.
+        """
+        ver = SemVer._coerce(ver)
+        i = bisect_right(self._keys, ver._key)
+        self._keys.insert(i, ver._key)
+        self._vers.insert(i, ver)
+
+    def index(self, ver):
+        """Return the position of the lowest indexed version that is equal to `ver`.
+
+        Parameters:
+            * ver (str, SemVer)
+
+        Raises:
+            * ValueError
+                No indexed version is equal to `ver`.
+            See `VersionIndex.__init__` for exceptions raised when `ver` is a string.
+
+        Returns:
+            * int
+        """
+        ver = SemVer._coerce(ver)
+        i = self.bisect_left(ver)
+        if i < len(self._keys) and self._keys[i] == ver._key:
+            return i
+        raise ValueError("%s is not indexed" % str(ver))
+
+    def bisect_left(self, ver):
+        """Return the position where `ver` would be inserted before any equal versions.
+
+        Parameters:
+            * ver (str, SemVer)
+
+        Returns:
+            * int
+        """
+        return bisect_left(self._keys, SemVer._coerce(ver)._key)
+
+    def bisect_right(self, ver):
+        """Return the position where `ver` would be inserted after any equal versions.
+
+        Parameters:
+            * ver (str, SemVer)
+
+        Returns:
+            * int
+        """
+        return bisect_right(self._keys, SemVer._coerce(ver)._key)
+
+    def matching(self, sel):
+        """Return all indexed versions that match the selector.
+
+        Parameters:
+            * sel (str, SemSel)
+
+        Raises:
+            See `SemSel.__init__` for exceptions raised when `sel` is a string.
+
+        Returns:
+            * list: The matching versions in ascending order, may be empty.
+        """
+        ret = []
+        for i, j in self._ranges(sel):
+            ret.extend(self._vers[i:j])
+        return ret
+
+    def max_satisfying(self, sel):
+        """Return the highest indexed version that matches the selector.
+
+        Parameters:
+            * sel (str, SemSel)
+
+        Returns:
+            * SemVer: The highest matching version.
+            * None:   No version matched.
+        """
+        for i, j in reversed(self._ranges(sel)):
+            if i < j:
+                return self._vers[j - 1]
+        return None
+
+    def min_satisfying(self, sel):
+        """Return the lowest indexed version that matches the selector.
+
+        Parameters:
+            * sel (str, SemSel)
+
+        Returns:
+            * SemVer: The lowest matching version.
+            * None:   No version matched.
+        """
+        for i, j in self._ranges(sel):
+            if i < j:
+                return self._vers[i]
+        return None
+
+    def count(self, sel):
+        """Return the number of indexed versions that match the selector.
+
+        Parameters:
+            * sel (str, SemSel)
+
+        Returns:
+            * int
+        """
+        return sum(j - i for i, j in self._ranges(sel))
+
+    # Private methods
+    def _ranges(self, sel):
+        """Private. Do not touch.
+
+        Return a list of `(start, stop)` slices of the sorted versions, one per selector interval.
+        """
+        sel = SemSel._coerce(sel)
+        keys = self._keys
+        return [(bisect_left(keys, lo), bisect_left(keys, hi))
+                for lo, hi in zip(sel._lows, sel._highs)]
+
+
+class MappedVersionIndex(VersionIndex):
+    """A read-only `VersionIndex` stored in a binary file that is memory-mapped.
+
+    Constructor: MappedVersionIndex("versions.idx")
+
+    The file is written once by `MappedVersionIndex.write()` and holds the versions already sorted,
+    so opening it does not parse or sort anything and processes mapping the same file share its
+    pages. Queries read the rows they bisect and return; pre-release and build strings are decoded
+    (and split) only when a row using them is read.
+
+    File format (little-endian):
+        header:  magic b"SVIX", uint32 format version (1), uint64 rows, uint64 strings
+        columns: rows x uint64 each for major, minor and patch, then rows x int64 each for the
+                 string table index of pre-release and build (-1 for none), all in sorted order
+        strings: (strings + 1) x uint64 offsets into the following ASCII data, then the data
+
+    Information on this particular class and their instances:
+        - Supports all queries of `VersionIndex`, `add()` raises a TypeError.
+        - Can be used as a context manager that closes the file.
+
+    Methods:
+        * write(path, vers) (classmethod)
+        * close()
+    """
+    # Private properties
+    _magic = b'SVIX'
+    _format = 1
+    _header = struct.Struct('<4sIQQ')
+
+    # Constructor
+    def __init__(self, path):
+        """Constructor examples:
+            MappedVersionIndex("versions.idx")
+
+        Parameters:
+            * path (str)
+                A file written by `MappedVersionIndex.write()`.
+
+        Raises:
+            * IOError, OSError
+                The file can not be opened.
+            * ValueError
+                The file is not a version index file (of this format version).
+        """
+        # Not calling `VersionIndex.__init__`, the rows are read from the file
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                raise ValueError("'%s' is not a version index file" % path)
+
+        mm, header = self._mmap, self._header
+        if len(mm) < header.size or mm[:4] != self._magic:
+            self.close()
+            raise ValueError("'%s' is not a version index file" % path)
+        magic, fmt, rows, strings = header.unpack_from(mm, 0)
+        if fmt != self._format:
+            self.close()
+            raise ValueError("Unsupported version index format %d" % fmt)
+
+        self._rows = rows
+        self._cols = [header.size + 8 * rows * i for i in range(5)]
+        self._offsets = header.size + 8 * rows * 5
+        self._data = self._offsets + 8 * (strings + 1)
+        self._strings = {-1: None}
+        self._split = {}
+        self._keys = _MappedRows(rows, self._row_key)
+        self._vers = _MappedRows(rows, self._row)
+
+    # Magic methods
+    def __repr__(self):
+        return 'MappedVersionIndex(%r)' % self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Utility methods
+    @classmethod
+    def write(cls, path, vers):
+        """Write versions sorted to a file that can be opened as MappedVersionIndex. Classmethod.
+
+        Parameters:
+            * path (str)
+            * vers (iterable of str or SemVer)
+
+        Raises:
+            * ValueError
+                A numeric component does not fit into 64 bits.
+            See `VersionIndex.__init__`.
+        """
+        vers = VersionIndex(vers)._vers
+        n = len(vers)
+        strings, ids = [], {}
+
+        def intern(s):
+            if s is None:
+                return -1
+            if s not in ids:
+                ids[s] = len(strings)
+                strings.append(s.encode('ascii'))
+            return ids[s]
+
+        try:
+            cols = [struct.pack('<%dQ' % n, *[v[i] for v in vers]) for i in range(3)]
+        except struct.error:
+            raise ValueError("Version components must fit into 64 bits")
+        cols += [struct.pack('<%dq' % n, *[intern(v[i]) for v in vers]) for i in (3, 4)]
+
+        offsets = [0]
+        for s in strings:
+            offsets.append(offsets[-1] + len(s))
+
+        with open(path, 'wb') as f:
+            f.write(cls._header.pack(cls._magic, cls._format, n, len(strings)))
+            for col in cols:
+                f.write(col)
+            f.write(struct.pack('<%dQ' % len(offsets), *offsets))
+            f.write(b''.join(strings))
+
+    def add(self, ver):
+        raise TypeError("MappedVersionIndex is read-only")
+
+    def close(self):
+        """Close the memory map. The index can not be queried anymore.
+        """
+        self._mmap.close()
+
+    # Private methods
+    def _string(self, i):
+        """Private. Do not touch.
+
+        Return the string with index `i` of the string table, `None` for -1.
+        """
+        s = self._strings.get(i, self)
+        if s is self:
+            start, stop = struct.unpack_from('<2Q', self._mmap, self._offsets + 8 * i)
+            s = self._strings[i] = self._mmap[self._data + start:self._data + stop].decode('ascii')
+        return s
+
+    def _fields(self, i):
+        """Private. Do not touch.
+
+        Return the five columns of row `i`, pre-release and build as string table indices.
+        """
+        mm, cols = self._mmap, self._cols
+        return (struct.unpack_from('<Q', mm, cols[0] + 8 * i)[0],
+                struct.unpack_from('<Q', mm, cols[1] + 8 * i)[0],
+                struct.unpack_from('<Q', mm, cols[2] + 8 * i)[0],
+                struct.unpack_from('<q', mm, cols[3] + 8 * i)[0],
+                struct.unpack_from('<q', mm, cols[4] + 8 * i)[0])
+
+    def _row(self, i):
+        """Private. Do not touch.
+
+        Create the SemVer of row `i`.
+        """
+        major, minor, patch, pre, build = self._fields(i)
+        return tuple.__new__(SemVer, (major, minor, patch, self._string(pre), self._string(build)))
+
+    def _row_key(self, i):
+        """Private. Do not touch.
+
+        Return the sort key (see `SemVer._key`) of row `i` without creating its SemVer.
+        """
+        major, minor, patch, pre, build = self._fields(i)
+        split = self._split
+        for j in (pre, build):
+            if j >= 0 and j not in split:
+                split[j] = SemVer._split_key(self._string(j))
+        return (major, minor, patch,
+                (1,) if pre < 0 else (0, split[pre]),
+                (0,) if build < 0 else (1, split[build]) if split[build] else (2,))
+
+
+class _MappedRows(object):
+    """Private. A read-only sequence of `n` items that are created by `get(i)` when accessed.
+    """
+    def __init__(self, n, get):
+        self.n, self.get = n, get
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.get(j) for j in range(*i.indices(self.n))]
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError("index out of range")
+        return self.get(i)
+
+
+class VersionArray(object):
+    """A compact, array-backed sequence of versions.
+
+    Constructor: VersionArray(["1.0.0", "1.2.0-beta+b.7"])
+
+    The numeric components are stored in typed `array.array` columns and the pre-release and build
+    components as indices into a table of interned strings, so a version takes a few dozen bytes
+    instead of a namedtuple with five separate objects. A column falls back to a list if a
+    component does not fit into the array's item type. SemVer objects are only created when items
+    are accessed.
+
+    Information on this particular class and their instances:
+        - Mutable, `append()`, `extend()` and `sort()` modify the array in place.
+        - Indexing returns a SemVer, slicing returns a new VersionArray.
+        - Iterating yields SemVer objects one at a time.
+        - Pickles as its columns and string table.
+
+    Methods:
+        * append(ver)
+        * extend(vers)
+        * sort(reverse=False)
+    """
+    # Private properties
+    try:
+        array('Q')
+        _typecode = 'Q'
+    except ValueError:  # Python <3.3
+        _typecode = 'L'
+    _batch_size = 4096  # strings parsed at once by `extend`
+
+    # Constructor
+    def __init__(self, vers=()):
+        """Constructor examples:
+            VersionArray()
+            VersionArray(["1.0.0", "1.0.1"])
+            VersionArray(open("versions.txt"))
+
+        Parameters:
+            * vers = `()` (iterable of str or SemVer; optional)
+                The versions to add, see `VersionArray.extend()`.
+
+        Raises:
+            See `VersionArray.extend()`.
+        """
+        super(VersionArray, self).__init__()
+
+        tc = self._typecode
+        self._cols = [array(tc), array(tc), array(tc), array('l'), array('l')]
+        self._strings = []
+        self._string_ids = {}
+        self.extend(vers)
+
+    # Magic methods
+    def __len__(self):
+        return len(self._cols[0])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            ret = self.__class__()
+            ret._cols = [col[i] for col in self._cols]
+            ret._strings = self._strings[:]
+            ret._string_ids = self._string_ids.copy()
+            return ret
+        return self._get(*(col[i] for col in self._cols))
+
+    def __iter__(self):
+        get = self._get
+        for row in zip(*self._cols):
+            yield get(*row)
+
+    def __repr__(self):
+        return 'VersionArray(%r)' % [str(v) for v in self]
+
+    def __reduce__(self):
+        # Pickle the columns and the string table, the lookup dict is rebuilt
+        return self.__class__, (), (self._cols, self._strings)
+
+    def __setstate__(self, state):
+        self._cols, self._strings = state
+        self._string_ids = dict((s, i) for i, s in enumerate(self._strings))
+
+    # Utility methods
+    def append(self, ver):
+        """Append a version.
+
+        Parameters:
+            * ver (str, SemVer)
+
+        Raises:
+            * TypeError
+                `ver` is not an instance of str (basestring) or SemVer.
+            * ValueError
+                A string version could not be parsed as a SemVer.
+        """
+        ver = SemVer._coerce(ver)
+        cols = self._cols
+        for i in range(3):
+            try:
+                cols[i].append(ver[i])
+            except OverflowError:
+                cols[i] = list(cols[i])
+                cols[i].append(ver[i])
+        cols[3].append(self._intern(ver[3]))
+        cols[4].append(self._intern(ver[4]))
+
+    def extend(self, vers):
+        """Append many versions.
+
+        Strings are parsed in bulk by `SemVer.parse_many()`, i.e. surrounding whitespace is ignored
+        and empty strings are skipped. They are collected in batches of a few thousand, so the
+        lines of a large file are not all held in memory at once.
+
+        Parameters:
+            * vers (iterable of str or SemVer)
+
+        Raises:
+            See `VersionArray.append()`.
+        """
+        strs, size = [], self._batch_size
+        for v in vers:
+            is_str = isinstance(v, basestring)
+            if is_str:
+                strs.append(v)
+                if len(strs) < size:
+                    continue
+            for sv in SemVer.parse_many(strs):
+                self.append(sv)
+            del strs[:]
+            if not is_str:
+                self.append(v)
+        for sv in SemVer.parse_many(strs):
+            self.append(sv)
+
+    def sort(self, reverse=False):
+        """Sort the versions in place.
+
+        The sort keys are computed from the columns directly, the identifiers of each string in the
+        string table are only split once.
+
+        Parameters:
+            * reverse = `False` (bool; optional)
+                Sort in descending order.
+        """
+        order = sorted(range(len(self)), key=self._row_keys().__getitem__, reverse=reverse)
+        self._cols = [array(col.typecode, [col[i] for i in order]) if isinstance(col, array)
+                      else [col[i] for i in order]
+                      for col in self._cols]
+
+    # Private methods
+    def _intern(self, s):
+        """Private. Do not touch.
+
+        Return the index of `s` in the string table, adding it if necessary. `None` is -1.
+        """
+        if s is None:
+            return -1
+        i = self._string_ids.get(s)
+        if i is None:
+            i = self._string_ids[s] = len(self._strings)
+            self._strings.append(s)
+        return i
+
+    def _get(self, major, minor, patch, pre, build):
+        """Private. Do not touch.
+
+        Create the SemVer of a row.
+        """
+        strs = self._strings
+        return tuple.__new__(SemVer, (major, minor, patch,
+                                      strs[pre] if pre >= 0 else None,
+                                      strs[build] if build >= 0 else None))
+
+    def _row_keys(self):
+        """Private. Do not touch.
+
+        Return a list with the sort key (see `SemVer._key`) of every row.
+        """
+        # The index -1 (None) picks the last item
+        split = [SemVer._split_key(s) for s in self._strings]
+        pres = [(0, x) for x in split] + [(1,)]
+        builds = [(1, x) if x else (2,) for x in split] + [(0,)]
+        return [(major, minor, patch, pres[pre], builds[build])
+                for major, minor, patch, pre, build in zip(*self._cols)]
+
+
+class SelectorIndex(object):
+    """Finds all of many selectors that match a given version.
+
+    Constructor: SelectorIndex([(">=1.0.0 <2.0.0", "pkg-a"), ("~1.2", "pkg-b")])
+
+    The compiled intervals of all selectors are stored in a centered interval tree, so a query is a
+    stabbing query in O(log n + number of matches) instead of matching every selector. Because
+    every comparator (including "!=" and "!") compiles to disjoint intervals, no selector needs to
+    be matched individually. Added selectors are kept in a small buffer and removed selectors are
+    filtered from the results until the tree is rebuilt, which happens lazily once enough of them
+    accumulated.
+
+    Methods:
+        * add(sel, payload=None)
+        * remove(handle)
+        * matching(ver)
+    """
+    # Constructor
+    def __init__(self, items=()):
+        """Constructor examples:
+            SelectorIndex()
+            SelectorIndex([SemSel("~1.2"), ("1.x || 2.x", dependent)])
+
+        Parameters:
+            * items = `()` (iterable; optional)
+                Selectors (str or SemSel) or `(selector, payload)` tuples, see `add()`.
+
+        Raises:
+            See `SelectorIndex.add()`.
+        """
+        super(SelectorIndex, self).__init__()
+
+        self._entries = {}   # handle: (sel, payload)
+        self._tree = None
+        self._tree_size = 0
+        self._pending = []   # (lo, hi, handle) added after the tree was built
+        self._removed = set()
+        self._next_handle = 0
+        for item in items:
+            if isinstance(item, tuple) and not isinstance(item, SemSel):
+                self.add(*item)
+            else:
+                self.add(item)
+
+    # Magic methods
+    def __len__(self):
+        return len(self._entries)
+
+    # Utility methods
+    def add(self, sel, payload=None):
+        """Add a selector.
+
+        Parameters:
+            * sel (str, SemSel)
+                Strings are compiled with `SemSel.compile()`.
+            * payload = `None` (any; optional)
+                Returned along with the selector when it matches.
+
+        Raises:
+            See `SemSel.__init__` for exceptions raised when `sel` is a string.
+
+        Returns:
+            * int: A handle that can be passed to `remove()`.
+        """
+        sel = SemSel._coerce(sel)
+        handle = self._next_handle
+        self._next_handle += 1
+        self._entries[handle] = (sel, payload)
+        self._pending.extend((lo, hi, handle) for lo, hi in sel._ivs)
+        return handle
+
+    def remove(self, handle):
+        """Remove a selector that was added before.
+
+        Parameters:
+            * handle (int)
+                The handle returned by `add()`.
+
+        Raises:
+            * KeyError
+                Unknown handle.
+        """
+        del self._entries[handle]
+        self._removed.add(handle)
+
+    def matching(self, ver):
+        """Return all selectors that match the version.
+
+        Parameters:
+            * ver (str, SemVer)
+
+        Raises:
+            * TypeError
+                `ver` is not an instance of str (basestring) or SemVer.
+            * ValueError
+                A string version could not be parsed as a SemVer.
+
+        Returns:
+            * list
+                `(sel, payload)` tuples of the matching selectors in the order they were added.
+        """
+        key = SemVer._coerce(ver)._key
+        if (len(self._pending) > max(32, self._tree_size // 8)
+                or len(self._removed) > max(32, self._tree_size // 2)):
+            self._rebuild()
+
+        handles = self._stab(self._tree, key)
+        handles.extend(h for lo, hi, h in self._pending if lo <= key < hi)
+        entries = self._entries
+        return [entries[h] for h in sorted(handles) if h in entries]
+
+    # Private methods
+    def _rebuild(self):
+        """Private. Do not touch.
+        """
+        ivs = [(lo, hi, h) for h, (sel, payload) in self._entries.items() for lo, hi in sel._ivs]
+        self._tree = self._build(ivs)
+        self._tree_size = len(ivs)
+        self._pending = []
+        self._removed = set()
+
+    @classmethod
+    def _build(cls, ivs):
+        """Private. Do not touch. Classmethod.
+
+        Build a node `(center, by_lo, by_hi, left, right)` of the interval tree. `by_lo` and `by_hi`
+        hold the intervals containing `center`, sorted ascending by their lower and descending by
+        their upper bound; `left` and `right` are the subtrees of the intervals below and above it.
+        """
+        if not ivs:
+            return None
+        # The lower median of all bounds always lies within at least one interval
+        bounds = sorted(b for lo, hi, h in ivs for b in (lo, hi))
+        center = bounds[(len(bounds) - 1) // 2]
+
+        here, left, right = [], [], []
+        for iv in ivs:
+            if iv[1] <= center:
+                left.append(iv)
+            elif iv[0] > center:
+                right.append(iv)
+            else:
+                here.append(iv)
+        return (center,
+                sorted(here, key=lambda iv: iv[0]),
+                sorted(here, key=lambda iv: iv[1], reverse=True),
+                cls._build(left), cls._build(right))
+
+    @staticmethod
+    def _stab(node, key):
+        """Private. Do not touch.
+
+        Return the handles of all intervals in the tree that contain `key`.
+        """
+        ret = []
+        while node is not None:
+            center, by_lo, by_hi, left, right = node
+            if key < center:
+                for lo, hi, h in by_lo:
+                    if lo > key:
+                        break
+                    ret.append(h)
+                node = left
+            else:
+                for lo, hi, h in by_hi:
+                    if hi <= key:
+                        break
+                    ret.append(h)
+                node = right if key > center else None
+        return ret
+
+
+class Instrumentation(object):
+    """Counts calls and accumulates the time spent in the hot paths of this module.
+
+    Constructor: Instrumentation(slow_selector=None, threshold=0.001)
+
+    Instrumented are:
+        SemVer._parse, SemVer._make_key (computing a version's sort key), the rich comparisons of
+        SemVer (SemVer.__lt__, SemVer.__le__, SemVer.__eq__, SemVer.__ne__, SemVer.__ge__,
+        SemVer.__gt__), SemVer.satisfies, SemSel._parse, SemSel.matches, SemSel._contains (the
+        lookup of a sort key in the compiled intervals, every match of a selector goes through it),
+        SemComparator.matches
+
+    While at least one instance is enabled, these methods are replaced on their classes by wrappers
+    that report to every enabled instance; once the last one is disabled the original methods are
+    restored. Disabled instrumentation therefore costs nothing at all. Note that the wrappers are
+    installed process-wide, i.e. an enabled instance also records calls of other threads. Enabling
+    and disabling is thread-safe.
+
+    The bulk parsers `SemVer.parse_many()` and `SemVer.parse_file()` (and everything built on them,
+    like `VersionArray.extend()` and `SemVer.loads()`) as well as `SemVer.finditer()` do not call
+    SemVer._parse and are not counted. Neither are sorting with `key=SemVer.sort_key`, which
+    compares plain tuples, and matching selectors specialized by `SemSel.specialize()`, which use
+    their own generated lookup instead of SemSel._contains.
+
+    Usage:
+        with Instrumentation() as inst:
+            resolve()
+        print(inst.stats())
+
+    Methods:
+        * enable()
+        * disable()
+        * stats()
+        * reset()
+    """
+    # Private properties
+    # (class, attribute, index of the selector in the arguments or None)
+    _targets = (
+        (SemVer, '_parse', None),
+        (SemVer, '_make_key', None),
+        (SemVer, '__lt__', None),
+        (SemVer, '__le__', None),
+        (SemVer, '__eq__', None),
+        (SemVer, '__ne__', None),
+        (SemVer, '__ge__', None),
+        (SemVer, '__gt__', None),
+        (SemVer, 'satisfies', 1),
+        (SemSel, '_parse', 1),
+        (SemSel, 'matches', 0),
+        (SemSel, '_contains', None),
+        (SemComparator, 'matches', None),
+    )
+    _active = []
+    _originals = {}
+    _lock = Lock()  # guards `_active` and installing the wrappers
+
+    # Constructor
+    def __init__(self, slow_selector=None, threshold=0.001):
+        """Constructor examples:
+            Instrumentation()
+            Instrumentation(lambda name, sel, secs: log.warning("%s(%s): %fs", name, sel, secs))
+
+        Parameters:
+            * slow_selector = `None` (callable; optional)
+                Called as `slow_selector(name, sel, seconds)` whenever a call of SemSel._parse,
+                SemSel.matches or SemVer.satisfies takes `threshold` seconds or longer. `name` is
+                the name of the method, `sel` the selector (string or SemSel).
+            * threshold = `0.001` (float; optional)
+                See `slow_selector`.
+        """
+        super(Instrumentation, self).__init__()
+
+        self.slow_selector = slow_selector
+        self.threshold = threshold
+        self.reset()
+
+    # Magic methods
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    # Utility methods
+    def enable(self):
+        """Start recording. Does nothing if already enabled.
+        """
+        cls = Instrumentation
+        with cls._lock:
+            if self in cls._active:
+                return
+            if not cls._active:
+                cls._install()
+            cls._active.append(self)
+
+    def disable(self):
+        """Stop recording. Does nothing if not enabled.
+        """
+        cls = Instrumentation
+        with cls._lock:
+            if self not in cls._active:
+                return
+            cls._active.remove(self)
+            if not cls._active:
+                cls._uninstall()
+
+    def stats(self):
+        """Return a snapshot of the recorded statistics.
+
+        Returns:
+            * dict
+                Maps the instrumented method names (e.g. 'SemSel.matches') to
+                `Stat(calls, seconds)` namedtuples.
+        """
+        return dict((name, _Stat(*s)) for name, s in self._stats.items())
+
+    def reset(self):
+        """Reset all counters and timers to zero.
+        """
+        self._stats = dict(('%s.%s' % (c.__name__, a), [0, 0.0]) for c, a, i in self._targets)
+
+    # Private methods
+    def _record(self, name, seconds, sel):
+        """Private. Do not touch.
+        """
+        s = self._stats[name]
+        s[0] += 1
+        s[1] += seconds
+        if sel is not None and self.slow_selector and seconds >= self.threshold:
+            self.slow_selector(name, sel, seconds)
+
+    @classmethod
+    def _install(cls):
+        """Private. Do not touch. Classmethod.
+        """
+        for klass, attr, sel_index in cls._targets:
+            orig = klass.__dict__[attr]
+            cls._originals[klass, attr] = orig
+            if isinstance(orig, classmethod):
+                wrapper = classmethod(cls._wrap(klass, attr, orig.__get__(None, klass).__func__,
+                                                sel_index))
+            else:
+                wrapper = cls._wrap(klass, attr, orig, sel_index)
+            setattr(klass, attr, wrapper)
+
+    @classmethod
+    def _uninstall(cls):
+        """Private. Do not touch. Classmethod.
+        """
+        for (klass, attr), orig in cls._originals.items():
+            setattr(klass, attr, orig)
+        cls._originals.clear()
+
+    @classmethod
+    def _wrap(cls, klass, attr, func, sel_index):
+        """Private. Do not touch. Classmethod.
+        """
+        name = '%s.%s' % (klass.__name__, attr)
+        active = cls._active
+        timer = default_timer
+
+        def wrapper(*args, **kwargs):
+            start = timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = timer() - start
+                sel = args[sel_index] if sel_index is not None else None
+                for inst in active[:]:  # may be changed by another thread
+                    inst._record(name, seconds, sel)
+
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+
+# Command line interface
+#
+def _external_sorted(vers, limit):
+    """Private. Do not touch. Generator.
+
+    Yield the versions of the iterable `vers` in ascending order. Runs of up to `limit` versions
+    are sorted in memory; if there is more than one run, each is written to a temporary file and
+    the files are merged.
+    """
+    import tempfile
+    from heapq import merge
+    from itertools import islice
+
+    vers = iter(vers)
+    runs = []
+    try:
+        while True:
+            run = sorted(islice(vers, limit))
+            if not runs and len(run) < limit:  # everything fits into memory
+                for ver in run:
+                    yield ver
+                return
+            if not run:
+                break
+            f = tempfile.TemporaryFile()
+            runs.append(f)
+            f.write(('\n'.join(str(v) for v in run) + '\n').encode('ascii'))
+            f.seek(0)
+            del run
+
+        for ver in merge(*(SemVer.parse_file(f, chunksize=1 << 16) for f in runs)):
+            yield ver
+    finally:
+        for f in runs:
+            f.close()
+
+
+def _main(argv=None, stdin=None, stdout=None):
+    """Private. Do not touch.
+
+    Run the command line interface (see the module's doc string) and return the exit status.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m semver',
+                                     description="Filter and sort the semantic versions read line "
+                                                 "by line from files or stdin.")
+    parser.add_argument('files', nargs='*', metavar='FILE',
+                        help="files to read versions from, none or '-' for stdin")
+    parser.add_argument('-s', '--satisfies', metavar='SEL',
+                        help="only output versions that match the selector SEL")
+    order = parser.add_mutually_exclusive_group()
+    order.add_argument('--sort', action='store_true', help="sort versions in ascending order")
+    order.add_argument('--max', action='store_true', help="only output the highest version")
+    order.add_argument('--min', action='store_true', help="only output the lowest version")
+    parser.add_argument('-u', '--unique', action='store_true', help="omit repeated versions")
+    parser.add_argument('--valid-only', action='store_true',
+                        help="skip lines that are not valid versions instead of failing")
+    parser.add_argument('--clean', action='store_true',
+                        help="take the first version found in each line (see SemVer.clean)")
+    parser.add_argument('--memory-limit', type=int, default=1 << 20, metavar='N',
+                        help="sort up to N versions in memory, merge temporary files beyond "
+                             "(default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.memory_limit < 1:
+        parser.error("--memory-limit must be at least 1")
+    sel = None
+    if args.satisfies is not None:
+        try:
+            sel = SemSel(args.satisfies)
+        except (ValueError, SelParseError) as e:
+            parser.error(str(e))
+
+    stdin = stdin or getattr(sys.stdin, 'buffer', sys.stdin)
+    stdout = stdout or sys.stdout
+    errors = 'skip' if args.valid_only else 'raise'
+
+    def read():
+        for name in args.files or ['-']:
+            f = stdin if name == '-' else open(name, 'rb')
+            try:
+                for ver in SemVer.parse_file(f, args.clean, errors):
+                    yield ver
+            except ValueError as e:
+                raise ValueError("%s: %s" % ('<stdin>' if name == '-' else name, e))
+            finally:
+                if f is not stdin:
+                    f.close()
+
+    def unique(vers):
+        seen = set()
+        for ver in vers:
+            if ver not in seen:
+                seen.add(ver)
+                yield ver
+
+    def unique_sorted(vers):
+        last = None
+        for ver in vers:
+            if ver != last:
+                yield ver
+            last = ver
+
+    def best(vers):
+        matching = sel or SemSel('*')
+        ver = matching.max_satisfying(vers) if args.max else matching.min_satisfying(vers)
+        if ver is not None:
+            yield ver
+
+    vers = read()
+    if args.max or args.min:
+        vers = best(vers)
+    else:
+        if sel is not None:
+            vers = sel.iter_matches(vers)
+        if args.sort:
+            vers = _external_sorted(vers, args.memory_limit)
+            if args.unique:
+                vers = unique_sorted(vers)
+        elif args.unique:
+            vers = unique(vers)
+
+    # Write in batches instead of line by line
+    count, batch = 0, []
+    try:
+        for ver in vers:
+            batch.append(str(ver))
+            if len(batch) == 4096:
+                stdout.write('\n'.join(batch) + '\n')
+                count += len(batch)
+                del batch[:]
+    except (EnvironmentError, ValueError) as e:
+        sys.stderr.write("%s: error: %s\n" % (parser.prog, e))
+        return 2
+    finally:
+        if batch:
+            stdout.write('\n'.join(batch) + '\n')
+            count += len(batch)
+        stdout.flush()
+
+    return 0 if count else 1
+
+
+if __name__ == '__main__':
+    sys.exit(_main())